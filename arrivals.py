@@ -0,0 +1,121 @@
+from __future__ import annotations
+import datetime
+import random
+
+from character import Character
+from events import TurnedAway
+
+from typing import TYPE_CHECKING, Iterator
+if TYPE_CHECKING:
+    from main import Game
+
+
+class ConstantRate:
+    """Customers arrive as a Poisson process with the same rate all day."""
+
+    def __init__(self, per_hour: float) -> None:
+        self.per_hour = per_hour
+        self.max_rate = per_hour
+
+    def rate_at(self, gametime: datetime.datetime) -> float:
+        return self.per_hour
+
+
+class TimeOfDayRate:
+    """Customers arrive as a Poisson process whose rate follows a curve of 24 hourly rates."""
+
+    # Relative busyness of a salon through the day, opening at 9 and closing at 19
+    SALON_DAY = [0, 0, 0, 0, 0, 0, 0, 0, 0,
+                 0.4, 0.6, 0.8, 1, 0.9, 0.6, 0.5, 0.7, 1, 0.8,
+                 0, 0, 0, 0, 0]
+
+    def __init__(self, hourly_rates: list[float]) -> None:
+        if len(hourly_rates) != 24: raise ValueError('A rate is needed for every hour of the day')
+
+        self.hourly_rates = hourly_rates
+        self.max_rate = max(hourly_rates)
+
+    def rate_at(self, gametime: datetime.datetime) -> float:
+        return self.hourly_rates[gametime.hour]
+
+    @classmethod
+    def salon_day(cls, peak_per_hour: float):
+        return cls([peak_per_hour*i for i in cls.SALON_DAY])
+
+
+def arrival_times(profile: ConstantRate|TimeOfDayRate, start: datetime.datetime, rng: random.Random) -> Iterator[datetime.datetime]:
+    """Lazily generates the gametimes customers arrive at.
+
+    Arrivals are drawn at the profile's peak rate and thinned down to the rate at that time of day."""
+    if profile.max_rate <= 0: return
+
+    gametime = start
+    while True:
+        gametime += datetime.timedelta(hours=rng.expovariate(profile.max_rate))
+        if rng.random()*profile.max_rate < profile.rate_at(gametime):
+            yield gametime
+
+
+class ArrivalEngine:
+    """Spawns customers as they arrive, turning them away or holding them at the door while the waiting chairs are full."""
+
+    BACKPRESSURE_POLICIES = ['turn away', 'hold at door']
+
+    def __init__(self, game: Game, profile: ConstantRate|TimeOfDayRate,
+                 backpressure: str = 'turn away', door_capacity: int = 4) -> None:
+        if backpressure not in self.BACKPRESSURE_POLICIES: raise ValueError(f'Unknown backpressure policy {backpressure}')
+
+        self.game = game
+        self.world = self.game.world
+
+        self.backpressure = backpressure
+        self.door_capacity = door_capacity
+
+        self.arrivals = arrival_times(profile, self.game.current_gametime, self.game.random)
+        self.next_arrival = next(self.arrivals, None)
+
+        # Customers held at the door aren't spawned until a chair frees up, so they're only counted
+        self.held_at_door = 0
+
+        self.arrived = 0
+        self.admitted = 0
+        self.turned_away = 0
+
+    def free_capacity(self) -> int:
+        free_waiting_chairs = sum(occupant is None for occupant in self.world.waiting_chairs.values())
+
+        # Customers that were let in but haven't claimed a chair yet already have one spoken for
+        unseated = sum(1 for character in self.game.characters
+                       if character.pending_actions[:1] == [('plan', 'sit in a waiting chair')])
+
+        return free_waiting_chairs - unseated
+
+    def admit(self):
+        self.game.add_character(Character.new(self.game))
+        self.admitted += 1
+
+    def on_arrival(self):
+        self.arrived += 1
+
+        if self.free_capacity() > 0:
+            self.admit()
+
+        elif self.backpressure == 'hold at door' and self.held_at_door < self.door_capacity:
+            self.held_at_door += 1
+
+        else:
+            self.turned_away += 1
+            self.game.events.emit(TurnedAway)
+
+    def update(self):
+        while self.held_at_door and self.free_capacity() > 0:
+            self.held_at_door -= 1
+            self.admit()
+
+        while self.next_arrival is not None and self.next_arrival <= self.game.current_gametime:
+            self.on_arrival()
+            self.next_arrival = next(self.arrivals, None)
+
+    def __str__(self) -> str:
+        return (f'{self.arrived} arrived, {self.admitted} admitted, '
+                f'{self.turned_away} turned away, {self.held_at_door} waiting at the door')
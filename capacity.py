@@ -0,0 +1,185 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from main import Game
+from windows import WorldWindow
+
+
+# What a configuration earns over a simulated day. Chairs and stylists cost money, so more isn't always better.
+HAIRCUT_PRICE = 40.0
+STYLIST_WAGE = 150.0  # per day
+HAIRCUTTING_CHAIR_COST = 20.0  # per day
+WAITING_CHAIR_COST = 5.0  # per day
+TURNED_AWAY_COST = 5.0  # goodwill lost for every customer turned away
+
+
+def chair_slots() -> list[tuple[int, int]]:
+    """Every position inside the salon a chair could go, ie. where customers can walk to from the door."""
+    world = WorldWindow.__new__(WorldWindow)
+    door = (24, 12)
+    slots, frontier = {door}, [door]
+    while frontier:
+        x, y = frontier.pop()
+        for dx, dy in ((2, 0), (-2, 0), (0, 1), (0, -1)):
+            position = (x+dx, y+dy)
+            if position not in slots and 0 <= position[0] <= 46 and 3 <= position[1] <= 12 and world.is_traversable(*position):
+                slots.add(position)
+                frontier.append(position)
+
+    # The rows by the door are left clear for walking in and out
+    return sorted(slot for slot in slots if slot[1] <= 10)
+
+
+class Configuration:
+
+    def __init__(self, waiting_chairs: list[tuple[int, int]], haircutting_chairs: list[tuple[int, int]], stylists: int) -> None:
+        self.waiting_chairs = waiting_chairs
+        self.haircutting_chairs = haircutting_chairs
+        self.stylists = stylists
+
+        self.results: list[dict] = []  # one per seed it's been simulated with
+
+    def settings(self, base: dict) -> dict:
+        return {**base, 'waiting_chairs': self.waiting_chairs, 'haircutting_chairs': self.haircutting_chairs,
+                'stylists': self.stylists}
+
+    @property
+    def score(self) -> float:
+        return sum(result['score'] for result in self.results) / len(self.results)
+
+    def describe(self) -> str:
+        return f'{len(self.waiting_chairs)} waiting chairs, {len(self.haircutting_chairs)} haircutting chairs, {self.stylists} stylists'
+
+
+def generate_configurations(rng: random.Random, placements: int, max_waiting: int = 12, max_haircutting: int = 8) -> list[Configuration]:
+    """Every combination of chair counts and stylists, each with a few random placements of the chairs, and the default
+    layout with every number of stylists."""
+    slots = chair_slots()
+    default_waiting = [tuple(position) for position in WorldWindow.WAITING_CHAIRS]
+    default_haircutting = [tuple(position) for position in WorldWindow.HAIRCUTTING_CHAIRS]
+
+    configurations = [Configuration(default_waiting, default_haircutting, stylists)
+                      for stylists in range(1, len(default_haircutting)+1)]
+    for waiting in range(2, max_waiting+1, 2):
+        for haircutting in range(1, max_haircutting+1):
+            for stylists in range(1, haircutting+1):
+                for _ in range(placements):
+                    chairs = rng.sample(slots, waiting+haircutting)
+                    configurations.append(Configuration(chairs[:waiting], chairs[waiting:], stylists))
+
+    return configurations
+
+
+def simulate(settings: dict, seed: int, days: float) -> dict:
+    """Runs one configuration headlessly and scores it, in a worker process."""
+    game = Game(seed=seed, headless=True, settings=settings)
+    game.run_headless(round(days*24*Game.TICKS_PER_GAMETIME_HOUR))
+
+    metrics = game.metrics
+    waiting, haircutting = len(game.world.WAITING_CHAIRS), len(game.world.HAIRCUTTING_CHAIRS)
+    score = (metrics.total_served*HAIRCUT_PRICE - metrics.total_turned_away*TURNED_AWAY_COST
+             - days*(settings['stylists']*STYLIST_WAGE + haircutting*HAIRCUTTING_CHAIR_COST + waiting*WAITING_CHAIR_COST))
+
+    return {
+        'seed': seed,
+        'score': score,
+        'served': metrics.total_served,
+        'turned_away': metrics.total_turned_away,
+        'wait_p95': metrics.wait_minutes.quantile(0.95),
+        'chair_utilisation': metrics.chair_utilisation(),
+    }
+
+
+def _simulate(job: tuple[dict, int, float]) -> dict:
+    return simulate(*job)
+
+
+def successive_halving(configurations: list[Configuration], base_settings: dict, days: float, keep: int,
+                       eta: int = 3, max_seeds: int = 27, workers: int|None = None) -> list[Configuration]:
+    """Simulates every configuration with one seed, keeps the best 1/eta of them, simulates those with eta times as
+    many seeds and so on, until only keep are left or they've been simulated with max_seeds. Returns the best keep."""
+    candidates = configurations
+    seeds = 1
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            jobs, owners = [], []
+            for configuration in candidates:
+                for seed in range(len(configuration.results), seeds):
+                    jobs.append((configuration.settings(base_settings), seed, days))
+                    owners.append(configuration)
+
+            start_time = time.perf_counter()
+            for configuration, result in zip(owners, pool.map(_simulate, jobs, chunksize=max(len(jobs)//(8*(workers or os.cpu_count() or 1)), 1))):
+                configuration.results.append(result)
+            print(f'{len(candidates)} configurations with {seeds} seeds: {len(jobs)} runs in {time.perf_counter()-start_time:.1f}s')
+
+            candidates.sort(key=lambda configuration: -configuration.score)
+            if len(candidates) <= keep or seeds >= max_seeds:
+                return candidates[:keep]
+
+            candidates = candidates[:max(len(candidates)//eta, keep)]
+            seeds = min(seeds*eta, max_seeds)
+
+
+def planned_runs(configurations: int, keep: int, eta: int = 3, max_seeds: int = 27) -> int:
+    """How many simulations successive_halving runs for that many configurations, to estimate how long it takes."""
+    runs, candidates, seeds, done = 0, configurations, 1, 0
+    while True:
+        runs += candidates*(seeds - done)
+        if candidates <= keep or seeds >= max_seeds:
+            return runs
+        candidates, done, seeds = max(candidates//eta, keep), seeds, min(seeds*eta, max_seeds)
+
+
+def write_report(path: str, ranked: list[Configuration], base_settings: dict, days: float):
+    with open(path, 'w') as f:
+        f.write(f'# Capacity report: {days:g} days at {base_settings["arrivals_per_hour"]:g} arrivals per hour'
+                f'{" (peak)" if base_settings["time_of_day"] else ""}\n\n')
+        for rank, configuration in enumerate(ranked, 1):
+            results = configuration.results
+            average = lambda key: sum(result[key] for result in results) / len(results)
+            f.write(f'{rank}. {configuration.describe()}: score {configuration.score:.0f} over {len(results)} seeds, '
+                    f'{average("served"):.1f} served, {average("turned_away"):.1f} turned away, '
+                    f'wait p95 {average("wait_p95"):.0f}m, chairs {average("chair_utilisation"):.0%} busy\n')
+            f.write(f'   waiting chairs at {configuration.waiting_chairs}\n')
+            f.write(f'   haircutting chairs at {configuration.haircutting_chairs}\n')
+
+    with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+        json.dump([{'waiting_chairs': configuration.waiting_chairs, 'haircutting_chairs': configuration.haircutting_chairs,
+                    'stylists': configuration.stylists, 'score': configuration.score, 'results': configuration.results}
+                   for configuration in ranked], f, indent=1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Searches for the most profitable salon layout and staffing')
+    parser.add_argument('--arrivals', type=float, default=12, metavar='PER_HOUR', help='customers arriving per game hour, at the peak')
+    parser.add_argument('--days', type=float, default=1, help='game days each configuration is simulated for')
+    parser.add_argument('--placements', type=int, default=2, help='random chair placements tried for every number of chairs')
+    parser.add_argument('--keep', type=int, default=10, help='configurations in the report')
+    parser.add_argument('--max-seeds', type=int, default=27, help='seeds the most promising configurations are simulated with')
+    parser.add_argument('--workers', type=int, help='processes to simulate in, one per core by default')
+    parser.add_argument('--seed', type=int, default=0, help='seed for placing chairs')
+    parser.add_argument('--report', default='capacity_report.txt', help='where the ranked report is written, with a .json alongside')
+    args = parser.parse_args()
+
+    base_settings = {**Game.DEFAULT_SETTINGS, 'arrivals_per_hour': args.arrivals, 'time_of_day': True}
+    configurations = generate_configurations(random.Random(args.seed), args.placements)
+
+    # One run of a middling configuration, timed here, gives a rough idea of how long the whole search takes
+    start_time = time.perf_counter()
+    simulate(configurations[len(configurations)//2].settings(base_settings), 0, args.days)
+    runs = planned_runs(len(configurations), args.keep, max_seeds=args.max_seeds)
+    estimate = runs*(time.perf_counter()-start_time) / (args.workers or os.cpu_count() or 1)
+    duration = f'{estimate:.0f} seconds' if estimate < 120 else f'{estimate/60:.0f} minutes'
+    print(f'Searching {len(configurations)} configurations in {runs} runs, about {duration}')
+
+    start_time = time.perf_counter()
+    ranked = successive_halving(configurations, base_settings, args.days, args.keep, max_seeds=args.max_seeds, workers=args.workers)
+    write_report(args.report, ranked, base_settings, args.days)
+    print(f'Done in {time.perf_counter()-start_time:.1f}s, best: {ranked[0].describe()} (score {ranked[0].score:.0f}), '
+          f'report written to {args.report}')
@@ -1,41 +1,55 @@
 from __future__ import annotations
-import random
 import datetime
 
 from vector import Vector2
-from utils import get_directions
 from mood import Mood
 from hair import Hair
+from events import Said, Moved, Seated, TurnedAway, StateChanged
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from main import Game
+    from customers import CustomerRecord
 
 
 #👧👩👩‍🦰🧑‍🦰👩‍🦳👩‍🦲🧑‍🦳👱‍♀️
 class Character:
 
+    # Position, scheduling, state and chair live in the game's EntityStore, this object is a facade over its row
+    __slots__ = ('game', 'world', 'events', 'entities', 'id', 'customer_id', 'arrival_tick', 'name', 'age', 'hair', 'starting_hair_lengths', 'mood',
+                 'has_cape', 'has_neck_roll', 'pending_actions', 'async_actions', 'greeted')
+
     NAMES = ['Emily', 'Alice', 'May', 'Olivia', 'Sophia', 'Ava', 
              'Isabella', 'Mia', 'Charlotte', 'Amelia', 'Haley', 
              'Evelyn', 'Abigail', 'Emily', 'Elizabeth', 'Sofia', 
              'Ella', 'Scarlett', 'Grace', 'Victoria']
 
-    def __init__(self, game: Game, name: str, age: int, hair: Hair, mood: Mood, position: Vector2):
+    def __init__(self, game: Game, name: str, age: int, hair: Hair, mood: Mood, position: Vector2, customer_id: int|None = None):
         self.game = game
         self.world = self.game.world
-        self.chat = self.game.chat
+        self.events = self.game.events
+        self.entities = self.game.entities
+
+        self.reset(name, age, hair, mood, position, customer_id)
+
+    def reset(self, name: str, age: int, hair: Hair, mood: Mood, position: Vector2, customer_id: int|None = None):
+        """Makes the character a newly arrived customer, used for new characters and ones reused from a pool."""
+        self.customer_id = customer_id if customer_id is not None else self.game.new_customer_id()
+        self.arrival_tick = self.game.current_tick
 
         self.name = name
         self.age = age
         self.hair = hair
+        if self.game.settings['hair_strands']:
+            self.hair.enable_strands(self.game.settings['hair_strands'], self.game.random.getrandbits(32))
+        self.starting_hair_lengths = [section._length for section in self.hair.sections]
         self.mood = mood
+        self.mood.start_waiting()
 
         self.has_cape = False
         self.has_neck_roll = False
 
-        self.position = position
-
-        self.time_to_next_action = self.game.current_gametime
+        self.id = self.entities.add(self, position, self.game.current_tick)
 
         self.pending_actions: list = [
             ('plan', 'sit in a waiting chair'),
@@ -45,63 +59,130 @@ class Character:
             ('interact with player', 'introduce self to player'),
         ]
 
+        self.greeted: set[int] = set()  # customer ids of the other customers they've said hi to
+
+    @property
+    def position(self) -> Vector2:
+        return Vector2(self.entities.x[self.id], self.entities.y[self.id])
+
+    @position.setter
+    def position(self, position: Vector2):
+        self.entities.x[self.id], self.entities.y[self.id] = position
+
+    @property
+    def state(self) -> str:
+        return self.entities.STATES[self.entities.state[self.id]]
+
+    def set_state(self, state: str, chair: int = -1):
+        tick = self.game.current_tick
+        self.events.emit(StateChanged, self, self.state, state, tick - self.entities.state_since[self.id])
+
+        self.entities.state[self.id] = self.entities.STATE_CODES[state]
+        self.entities.state_since[self.id] = tick
+        self.entities.chair[self.id] = chair
+
+    @property
+    def chair(self) -> int:
+        """Index of the haircutting chair the character is in, or -1."""
+        return self.entities.chair[self.id] if self.state == 'being served' else -1
+
+    @property
+    def time_to_next_action(self) -> datetime.datetime:
+        return self.game.gametime_at(self.entities.ready_tick[self.id])
+
+    def wake(self):
+        """Makes sure the scheduler visits this character again now that it has something to do."""
+        if self.pending_actions:
+            self.entities.next_action_tick[self.id] = self.entities.ready_tick[self.id]
+
     def add_action(self, action, args):
         self.pending_actions.append((action, args))
+        self.wake()
+
+    @property
+    def is_leaving(self) -> bool:
+        return ('plan', 'walk out') in self.pending_actions or any(action == 'leave' for action, _ in self.pending_actions)
 
     def on_player_interact(self):
+        self.mood.on_event('greeted')
         if ('interact with player', 'introduce self to player') in self.async_actions:
-            self.chat.add_dialogue(f'{self.name}: Hi! My name is {self.name}.')
-
-    def goto_position(self, target_position):
-        directions = get_directions(self.position, target_position, self.world.is_traversable)
+            self.events.emit(Said, '{0}: Hi! My name is {0}.', self.name)
 
-        if directions == -1: return False
+    def goto_position(self, target_position, on_no_path=None):
+        """Asks the planner for a path and holds the character's later actions until it's followed.
 
-        self.pending_actions.extend([('move', direction) for direction in directions])
-        return True
+        on_no_path is an action done instead if there turns out to be no path."""
+        path = self.game.planner.request(self.position, target_position)
+        self.pending_actions.append(('follow path', (path, on_no_path)))
+        self.wake()
     
     ACTION_TIME_COST = {
         'plan': datetime.timedelta(minutes=1),
+        'follow path': datetime.timedelta(0),
         'move': datetime.timedelta(seconds=15),
         'leave': datetime.timedelta(minutes=1)
     }  # In minutes
 
     def update(self):
-        if not self.pending_actions or self.time_to_next_action > self.game.current_gametime: return
+        if not self.pending_actions or self.entities.ready_tick[self.id] > self.game.current_tick: return
 
         action, args = self.pending_actions.pop(0)
 
         if action == 'move':
-            self.position += args
-            self.world.needs_refresh = True
+            position = self.position + args
+            self.position = position
+            self.game.nearby.move(self, position.x, position.y)
+            self.events.emit(Moved, self)
+            if (self.events.wants(Seated) and self.entities.state[self.id] == self.entities.STATE_CODES['waiting']
+                    and position == self.world.WAITING_CHAIRS[self.entities.chair[self.id]]):
+                self.events.emit(Seated, self)
+
+        elif action == 'follow path':
+            path, on_no_path = args
+            if not path.done():
+                # Still being planned, the character holds until it arrives and is looked at again next tick
+                self.pending_actions.insert(0, (action, args))
+                self.entities.next_action_tick[self.id] = self.game.current_tick + 1
+                return
+
+            directions = path.result()
+            if directions is not None:
+                self.pending_actions[0:0] = [('move', Vector2(*direction)) for direction in directions]
+            elif on_no_path is not None:
+                self.pending_actions.insert(0, on_no_path)
 
         elif action == 'leave':
             if self.position != Vector2(22, 12): raise Exception('Canno\'t leave unless at exit')
 
-            self.game.characters.remove(self)
-            self.world.needs_refresh = True
+            self.game.remove_character(self)
+            return
 
         elif action == 'plan':
             if args == 'sit in a waiting chair':
                 free_waiting_chairs = [pos for pos, occupant in self.world.waiting_chairs.items() if occupant is None]
                 if free_waiting_chairs:
-                    character_waiting_chair_pos = random.choice(free_waiting_chairs)
+                    character_waiting_chair_pos = self.game.random.choice(free_waiting_chairs)
                     self.world.waiting_chairs[character_waiting_chair_pos] = self
-                    if not self.goto_position(character_waiting_chair_pos):
-                        # Planning couldn't be done, so plan again next time
-                        self.pending_actions.insert(0, (action, args))
+                    self.set_state('waiting', self.world.WAITING_CHAIRS.index(character_waiting_chair_pos))
+                    # If planning can't be done, plan again next time
+                    self.goto_position(character_waiting_chair_pos, on_no_path=(action, args))
+
+                else:
+                    # Nowhere to sit, so leave instead of standing at the door forever
+                    self.events.emit(Said, '{}: All the seats are taken, I\'ll come back later.', self.name)
+                    self.events.emit(TurnedAway, self)
+                    self.add_action('plan', 'walk out')
 
             elif args == 'sit in a haircutting chair':
                 free_haircutting_chairs = [pos for pos, occupant in self.world.haircutting_chairs.items() if occupant is None]
                 if free_haircutting_chairs:
-                    character_haircutting_chair_pos = random.choice(free_haircutting_chairs)
+                    character_haircutting_chair_pos = self.game.random.choice(free_haircutting_chairs)
                     self.world.waiting_chairs[self.position] = None
                     self.world.haircutting_chairs[character_haircutting_chair_pos] = self
-                    if not self.goto_position(character_haircutting_chair_pos):
-                        # Planning couldn't be done, so plan again next time
-                        pass
-                        # Not readding plan
-                        #self.pending_actions.insert(0, (action, args))
+                    self.set_state('being served', self.world.HAIRCUTTING_CHAIRS.index(character_haircutting_chair_pos))
+                    self.mood.stop_waiting()
+                    self.mood.on_event('seated')
+                    self.goto_position(character_haircutting_chair_pos)
 
             elif args == 'walk out':
                 if self.position in self.world.haircutting_chairs:
@@ -110,6 +191,8 @@ class Character:
                 elif self.position in self.world.waiting_chairs:
                     self.world.waiting_chairs[self.position] = None
 
+                self.set_state('leaving')
+
                 self.goto_position(Vector2(22, 12))
                 self.add_action('leave', None)
 
@@ -119,9 +202,43 @@ class Character:
         else:
             raise NotImplementedError()
         
-        self.time_to_next_action = self.game.current_gametime + self.ACTION_TIME_COST[action]
+        ready_tick = self.game.current_tick + self.game.ticks_in(self.ACTION_TIME_COST[action])
+        self.entities.ready_tick[self.id] = ready_tick
+        self.entities.next_action_tick[self.id] = ready_tick if self.pending_actions else self.entities.NEVER
+
+    def on_haircut_finished(self):
+        """Customers are pleased if their hair was actually cut and they aren't sent off with it still wet."""
+        was_cut = any(section._length < length for section, length in zip(self.hair.sections, self.starting_hair_lengths))
+        is_dry = all(section._wetness == 0 for section in self.hair.sections)
+
+        self.mood.on_event('good haircut' if was_cut and is_dry else 'bad haircut')
+
+    RETURN_AFTER = datetime.timedelta(days=1)  # customers don't come back sooner than this
+    ENTRANCE = Vector2(24, 12)  # where customers appear, it's only read so every customer shares it
 
     @classmethod
     def new(cls, game: Game):
-        return cls(game, random.choice(cls.NAMES), random.randint(18, 30), Hair.new(), Mood.new(), Vector2(24, 12))
+        if game.customers is not None and game.random.random() < game.settings['returning_share']:
+            present = {character.customer_id for character in game.characters}
+            record = game.customers.pick_returning(game.random, game.current_gametime - cls.RETURN_AFTER, present)
+            if record is not None:
+                return cls.returning(game, record)
+
+        pools = game.pools
+        name, age = game.random.choice(cls.NAMES), game.random.randint(18, 30)
+        return pools.new_character(game, name, age, pools.new_hair(), pools.new_mood(game.moods), cls.ENTRANCE)
+
+    @classmethod
+    def returning(cls, game: Game, record: CustomerRecord):
+        """A customer from the customer store coming back, with their hair grown since they left."""
+        pools = game.pools
+        hair = pools.new_hair(record.lengths)
+        days_passed = (game.current_gametime - record.last_visit) / datetime.timedelta(days=1)
+        for section, health in zip(hair.sections, record.health):
+            section._health = health
+            section.grow(days_passed)
+        hair.evaluate_description()
+
+        return pools.new_character(game, record.name, record.age, hair, pools.new_mood(game.moods, record.mood), cls.ENTRANCE,
+                                   customer_id=record.id)
         
\ No newline at end of file
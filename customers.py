@@ -0,0 +1,165 @@
+from __future__ import annotations
+import datetime
+import sqlite3
+from array import array
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from character import Character
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    lengths BLOB NOT NULL,  -- a float64 for every hair section, in the order of Hair.REGION_NAMES
+    health BLOB NOT NULL,  -- likewise
+    mood TEXT NOT NULL,  -- when they last left
+    visits INTEGER NOT NULL,
+    last_visit TEXT NOT NULL  -- game time they last left at
+);
+CREATE INDEX IF NOT EXISTS customers_by_last_visit ON customers (last_visit);
+
+CREATE TABLE IF NOT EXISTS visits (
+    customer_id INTEGER NOT NULL REFERENCES customers (id),
+    arrived TEXT NOT NULL,
+    left TEXT NOT NULL,
+    mood TEXT NOT NULL,
+    hair_cut INTEGER NOT NULL  -- whether any section was shorter when they left
+);
+CREATE INDEX IF NOT EXISTS visits_by_customer ON visits (customer_id);
+'''
+
+
+class CustomerRecord:
+    """A customer as they were when they last left the salon."""
+
+    __slots__ = ('id', 'name', 'age', 'lengths', 'health', 'mood', 'visits', 'last_visit')
+
+    def __init__(self, id: int, name: str, age: int, lengths: list[float], health: list[float], mood: str,
+                 visits: int, last_visit: datetime.datetime) -> None:
+        self.id = id
+        self.name = name
+        self.age = age
+        self.lengths = lengths
+        self.health = health
+        self.mood = mood
+        self.visits = visits
+        self.last_visit = last_visit
+
+    @classmethod
+    def from_row(cls, row: tuple) -> CustomerRecord:
+        id, name, age, lengths, health, mood, visits, last_visit = row
+        return cls(id, name, age, array('d', lengths).tolist(), array('d', health).tolist(), mood, visits,
+                   datetime.datetime.fromisoformat(last_visit))
+
+
+class CustomerStore:
+    """Customers that have visited the salon, kept in SQLite so that they can come back in later sessions.
+
+    Nothing is loaded up front: customers are looked up one at a time by id, or picked by when they last visited, both
+    through an index. Visits are buffered and written once per game hour in a single transaction."""
+
+    COLUMNS = 'id, name, age, lengths, health, mood, visits, last_visit'
+
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+        self.pending_customers: dict[int, tuple] = {}  # latest row of every customer since the last flush, by id
+        self.pending_visits: list[tuple] = []
+
+    def snapshot(self, path: str):
+        """Copies the database as it is now to a file, for a journal to be replayed against."""
+        self.flush()
+        target = sqlite3.connect(path)
+        self.connection.backup(target)
+        target.close()
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> CustomerStore:
+        """A store holding a copy of a snapshot in memory, so that what a replay writes never changes the snapshot."""
+        store = cls(':memory:')
+        source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        source.backup(store.connection)
+        source.close()
+        return store
+
+    def max_id(self) -> int:
+        """The highest id given to a customer, so that new customers don't reuse one."""
+        written, = self.connection.execute('SELECT MAX(id) FROM customers').fetchone()
+        return max([written or 0, *self.pending_customers])
+
+    def get(self, customer_id: int) -> CustomerRecord|None:
+        if customer_id in self.pending_customers:
+            return CustomerRecord.from_row(self.pending_customers[customer_id])
+
+        row = self.connection.execute(f'SELECT {self.COLUMNS} FROM customers WHERE id = ?', (customer_id,)).fetchone()
+        return CustomerRecord.from_row(row) if row else None
+
+    def pick_returning(self, rng, before: datetime.datetime, exclude: set[int]) -> CustomerRecord|None:
+        """A customer who last left before a time and isn't in exclude, picked with rng, or None if there isn't one.
+
+        Looks from a random id onwards and then back from it, skipping the excluded customers and the ones waiting to be
+        flushed in the query itself, so however many of them there are it finds a customer if there is one."""
+        highest = self.max_id()
+        if not highest: return None
+
+        skipped = [*exclude, *self.pending_customers]
+        not_skipped = f'AND id NOT IN ({", ".join("?"*len(skipped))})' if skipped else ''
+
+        start = rng.randint(1, highest)
+        for query in ('id >= ? AND last_visit < ? {} ORDER BY id', 'id < ? AND last_visit < ? {} ORDER BY id DESC'):
+            row = self.connection.execute(f'SELECT {self.COLUMNS} FROM customers WHERE {query.format(not_skipped)} LIMIT 1',
+                                          (start, before.isoformat(), *skipped)).fetchone()
+            if row is not None:
+                return CustomerRecord.from_row(row)
+
+        return None
+
+    def last_visit(self) -> datetime.datetime|None:
+        """When the most recent customer left, ie. when the salon was last open."""
+        latest, = self.connection.execute('SELECT MAX(last_visit) FROM customers').fetchone()
+        return datetime.datetime.fromisoformat(latest) if latest else None
+
+    def record_visit(self, character: Character, arrived: datetime.datetime, left: datetime.datetime):
+        """Buffers a customer's state as they leave, it's written on the next flush."""
+        lengths = [section._length for section in character.hair.sections]
+        previous = self.get(character.customer_id)
+
+        self.pending_customers[character.customer_id] = (
+            character.customer_id, character.name, character.age,
+            array('d', lengths).tobytes(), array('d', [section._health for section in character.hair.sections]).tobytes(),
+            character.mood.current_mood, (previous.visits if previous else 0) + 1, left.isoformat())
+
+        hair_cut = any(length < start for length, start in zip(lengths, character.starting_hair_lengths))
+        self.pending_visits.append((character.customer_id, arrived.isoformat(), left.isoformat(),
+                                    character.mood.current_mood, hair_cut))
+
+    def visits(self, customer_id: int) -> list[tuple[str, str, str, bool]]:
+        """(arrived, left, mood, whether their hair was cut) of every visit a customer has made, oldest first."""
+        self.flush()
+        return [(arrived, left, mood, bool(hair_cut)) for arrived, left, mood, hair_cut in self.connection.execute(
+            'SELECT arrived, left, mood, hair_cut FROM visits WHERE customer_id = ? ORDER BY rowid', (customer_id,))]
+
+    def flush(self):
+        if not self.pending_customers and not self.pending_visits: return
+
+        with self.connection:
+            self.connection.executemany(f'INSERT OR REPLACE INTO customers ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                        self.pending_customers.values())
+            self.connection.executemany('INSERT INTO visits VALUES (?, ?, ?, ?, ?)', self.pending_visits)
+
+        self.pending_customers = {}
+        self.pending_visits = []
+
+    def __len__(self) -> int:
+        self.flush()
+        count, = self.connection.execute('SELECT COUNT(*) FROM customers').fetchone()
+        return count
+
+    def close(self):
+        self.flush()
+        self.connection.close()
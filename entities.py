@@ -0,0 +1,83 @@
+from __future__ import annotations
+from array import array
+from itertools import compress, repeat
+from operator import le
+
+from vector import Vector2
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from character import Character
+
+
+class EntityStore:
+    """The hot per-character state, kept in parallel typed arrays indexed by entity id.
+
+    A Character is a facade over one row. Systems that touch every character each tick (scheduling, movement,
+    exporting) work over the arrays instead of visiting every Character object."""
+
+    STATES = ['arriving', 'waiting', 'being served', 'leaving']
+    STATE_CODES = {state: i for i, state in enumerate(STATES)}
+
+    NO_CHAIR = -1
+    NEVER = 2**63 - 1  # next_action_tick of a character with nothing to do
+
+    def __init__(self) -> None:
+        self.alive = bytearray()
+        self.x = array('h')
+        self.y = array('h')
+        self.ready_tick = array('q')  # first tick the character can act on after its last action
+        self.next_action_tick = array('q')  # ready_tick if the character has pending actions, NEVER otherwise
+        self.state = array('B')
+        self.state_since = array('q')  # tick the character entered its state
+        self.chair = array('h')  # index into the world's chairs of the character's state, or NO_CHAIR
+
+        self.characters: list[Character|None] = []
+        self.free_ids: list[int] = []
+
+    def add(self, character: Character, position: Vector2, tick: int) -> int:
+        if self.free_ids:
+            entity = self.free_ids.pop()
+            self.x[entity], self.y[entity] = position
+            self.ready_tick[entity] = tick
+            self.next_action_tick[entity] = tick
+            self.state[entity] = 0
+            self.state_since[entity] = tick
+            self.chair[entity] = self.NO_CHAIR
+            self.alive[entity] = 1
+            self.characters[entity] = character
+
+        else:
+            entity = len(self.characters)
+            self.x.append(position.x)
+            self.y.append(position.y)
+            self.ready_tick.append(tick)
+            self.next_action_tick.append(tick)
+            self.state.append(0)
+            self.state_since.append(tick)
+            self.chair.append(self.NO_CHAIR)
+            self.alive.append(1)
+            self.characters.append(character)
+
+        return entity
+
+    def remove(self, entity: int):
+        self.next_action_tick[entity] = self.NEVER
+        self.alive[entity] = 0
+        self.characters[entity] = None
+        self.free_ids.append(entity)
+
+    def __len__(self) -> int:
+        return len(self.characters) - len(self.free_ids)
+
+    def due(self, tick: int) -> list[int]:
+        """Ids of every character with an action to do on this tick, found without leaving C."""
+        return list(compress(range(len(self.next_action_tick)), map(le, self.next_action_tick, repeat(tick))))
+
+    def count_in_state(self, state: str) -> int:
+        return sum(1 for alive, code in zip(self.alive, self.state) if alive and code == self.STATE_CODES[state])
+
+    def nbytes(self) -> int:
+        """Bytes used by the arrays, ie. the per-character cost of the store itself."""
+        return sum(memoryview(column).nbytes for column in
+                   (self.alive, self.x, self.y, self.ready_tick, self.next_action_tick, self.state, self.state_since, self.chair))
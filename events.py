@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable
+if TYPE_CHECKING:
+    from main import Game
+    from character import Character
+    from services import ServiceCommand
+
+
+class Event:
+    """Something that happened in the simulation. Events are small and only hold what subscribers need."""
+
+    __slots__ = ('tick',)
+
+    def __init__(self, tick: int) -> None:
+        self.tick = tick
+
+    def fields(self) -> dict:
+        return {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())}
+
+
+class Said(Event):
+    """A line for the chat. It's only formatted when a subscriber asks for its text."""
+
+    __slots__ = ('template', 'args')
+
+    def __init__(self, tick: int, template: str, *args) -> None:
+        super().__init__(tick)
+        self.template = template
+        self.args = args
+
+    def text(self) -> str:
+        return self.template.format(*self.args) if self.args else self.template
+
+
+class Moved(Event):
+    __slots__ = ('character',)
+
+    def __init__(self, tick: int, character: Character) -> None:
+        super().__init__(tick)
+        self.character = character
+
+
+class Seated(Event):
+    """A customer reaching the waiting chair they were given, which can be a while after they were given it."""
+
+    __slots__ = ('character',)
+
+    def __init__(self, tick: int, character: Character) -> None:
+        super().__init__(tick)
+        self.character = character
+
+
+class Arrived(Event):
+    __slots__ = ('character',)
+
+    def __init__(self, tick: int, character: Character) -> None:
+        super().__init__(tick)
+        self.character = character
+
+
+class Left(Event):
+    __slots__ = ('character', 'visit_ticks')
+
+    def __init__(self, tick: int, character: Character, visit_ticks: int) -> None:
+        super().__init__(tick)
+        self.character = character
+        self.visit_ticks = visit_ticks
+
+
+class TurnedAway(Event):
+    """A customer that left without a chair, or None for one turned away at the door before coming in."""
+
+    __slots__ = ('character',)
+
+    def __init__(self, tick: int, character: Character|None = None) -> None:
+        super().__init__(tick)
+        self.character = character
+
+
+class StateChanged(Event):
+    __slots__ = ('character', 'old_state', 'new_state', 'ticks_in_old_state')
+
+    def __init__(self, tick: int, character: Character, old_state: str, new_state: str, ticks_in_old_state: int) -> None:
+        super().__init__(tick)
+        self.character = character
+        self.old_state = old_state
+        self.new_state = new_state
+        self.ticks_in_old_state = ticks_in_old_state
+
+
+class ServiceDone(Event):
+    """A service done to a customer, sections are indices into Hair.sections or None for services without one."""
+
+    __slots__ = ('customer_id', 'command', 'sections', 'chair')
+
+    def __init__(self, tick: int, customer_id: int, command: ServiceCommand, sections: list[int]|None, chair: int) -> None:
+        super().__init__(tick)
+        self.customer_id = customer_id
+        self.command = command
+        self.sections = sections
+        self.chair = chair
+
+
+class EventBus:
+    """Simulation code emits events here instead of calling into the chat, the windows, the metrics or the ledger.
+
+    Events wait in a buffer until deliver() is called once at the end of a tick, and every subscriber is then handed
+    all the events of its type from that tick in one list, in the order they were emitted. An event nobody subscribes
+    to isn't even created, so a subscriber that isn't attached costs a dict lookup."""
+
+    def __init__(self, game: Game) -> None:
+        self.game = game
+        self.subscribers: dict[type[Event], list[Callable[[list], None]]] = {}
+        self.pending: dict[type[Event], list[Event]] = {}
+
+    def subscribe(self, event_type: type[Event], handler: Callable[[list], None]):
+        self.subscribers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type: type[Event], handler: Callable[[list], None]):
+        handlers = self.subscribers.get(event_type, [])
+        if handler in handlers: handlers.remove(handler)
+        if not handlers: self.subscribers.pop(event_type, None)
+
+    def wants(self, event_type: type[Event]) -> bool:
+        return event_type in self.subscribers
+
+    def emit(self, event_type: type[Event], *args):
+        """Creates an event from args, stamped with the current tick, if anything subscribes to its type."""
+        if event_type in self.subscribers:
+            self.pending.setdefault(event_type, []).append(event_type(self.game.current_tick, *args))
+
+    def deliver(self):
+        if not self.pending: return
+
+        pending, self.pending = self.pending, {}
+        for event_type, events in pending.items():
+            for handler in self.subscribers.get(event_type, ()):
+                handler(events)
+
+
+class EventLog:
+    """Writes every event of some types to a text file, one line each, for debugging a simulation."""
+
+    def __init__(self, bus: EventBus, path: str, event_types: list[type[Event]]|None = None) -> None:
+        self.file = open(path, 'a')
+        for event_type in event_types or [Said, Arrived, Seated, Left, TurnedAway, StateChanged, ServiceDone]:
+            bus.subscribe(event_type, self.write)
+
+    def write(self, events: list[Event]):
+        for event in events:
+            fields = event.fields()
+            tick = fields.pop('tick')
+            if isinstance(event, Said):
+                fields = {'text': event.text()}
+            described = ' '.join(f'{name}={self.describe(value)}' for name, value in fields.items())
+            self.file.write(f'{tick} {type(event).__name__} {described}\n')
+
+    @staticmethod
+    def describe(value) -> str:
+        if hasattr(value, 'customer_id'):
+            return str(value.customer_id)
+        if hasattr(value, 'name') and not isinstance(value, str):
+            return value.name
+        return repr(value)
+
+    def close(self):
+        self.file.close()
@@ -1,6 +1,10 @@
 from __future__ import annotations
 from collections import defaultdict
 
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from strands import StrandHair
+
 
 class Hair:
 
@@ -94,17 +98,53 @@ class Hair:
             for region_name in row:
                 self.sections_by_position[-1].append(self.get_region(region_name) if region_name else None)
 
+        self.strands: StrandHair|None = None
+        self.spare_strands: StrandHair|None = None
+
         self.description = ''
         self.evaluate_description()
 
+    def reset(self, starting_lengths: list[float]|None = None):
+        """Gives the hair new starting lengths as if it was new, so that it can be reused instead of allocating another."""
+        if starting_lengths is None:
+            starting_lengths = [20.0] * len(self.REGION_NAMES)
+
+        for section, length in zip(self.sections, starting_lengths):
+            section.reset(length)
+        # Strands are kept for reuse, but only count once enable_strands() refills them from the sections
+        self.spare_strands, self.strands = self.strands or self.spare_strands, None
+
+        self.evaluate_description()
+
+    def enable_strands(self, strands_per_section: int, seed: int = 0):
+        """Switches to the strand level backend in strands.py, which needs numpy. The sections stay, as summaries."""
+        spare, self.spare_strands = self.spare_strands, None
+        if spare is not None and spare.lengths.shape[1] == strands_per_section:
+            spare.reset(seed)
+            self.strands = spare
+            return
+
+        from strands import StrandHair
+        self.strands = StrandHair(self, strands_per_section, seed)
+
     def on_wash(self):
+        if self.strands is not None:
+            return self.strands.wash()
+
         for section in self.sections:
             section._wetness = 1
 
     def on_blow_dry(self):
+        if self.strands is not None:
+            return self.strands.blow_dry()
+
         for section in self.sections:
             section._wetness = 0
 
+    def get_masked_sections(self, mode: str, position: tuple[int, int]) -> list[HairSection]:
+        """The sections a tool used in a mode ('precise', 'wide' or 'bulk') at a position on the grid reaches."""
+        return [self.sections[i] for i in SECTION_MASKS[mode][tuple(position)]]
+
     def get_region(self, region_name: str) -> HairSection:
         return getattr(self, region_name.replace(' ', '_'))
 
@@ -150,6 +190,36 @@ class Hair:
 
 
 
+def _build_section_masks() -> dict[str, dict[tuple[int, int], tuple[int, ...]]]:
+    """Precomputes, for every tool mode and every position on the hair grid, the indices of the sections reached.
+
+    precise reaches the section under the cursor, wide also reaches its neighbours above, below and to the sides,
+    and bulk reaches the whole head."""
+    masks = {'precise': {}, 'wide': {}, 'bulk': {}}
+    everything = tuple(range(len(Hair.REGION_NAMES)))
+
+    for y, row in enumerate(Hair.REGIONS_BY_POSITION):
+        for x, region_name in enumerate(row):
+            if region_name is None: continue
+
+            neighbourhood = []
+            for dx, dy in ((0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)):
+                if 0 <= y+dy < len(Hair.REGIONS_BY_POSITION) and 0 <= x+dx < len(row):
+                    neighbour = Hair.REGIONS_BY_POSITION[y+dy][x+dx]
+                    if neighbour is not None:
+                        neighbourhood.append(Hair.REGION_NAMES.index(neighbour))
+
+            masks['precise'][x, y] = (Hair.REGION_NAMES.index(region_name),)
+            masks['wide'][x, y] = tuple(sorted(neighbourhood))
+            masks['bulk'][x, y] = everything
+
+    return masks
+
+
+SECTION_MASKS = _build_section_masks()
+SECTION_INDICES = {region_name: i for i, region_name in enumerate(Hair.REGION_NAMES)}
+
+
 class HairSection:
 
     LENGTH_RANGES = [
@@ -173,7 +243,9 @@ class HairSection:
 
     def __init__(self, region_name: str, length: float):
         self.region_name: str = region_name
-        
+        self.reset(length)
+
+    def reset(self, length: float):
         self._length: float = length # in inches
         self._intrinsic_growth_rate: float = 0.1  # length per health per day
         self._health: float = 1  # Between 0(unhealthy) and 1(healthy)
@@ -193,7 +265,7 @@ class HairSection:
         return self._intrinsic_growth_rate * self._health
 
     def grow(self, days_passed):
-        self._length += self.growth_rate + days_passed
+        self._length += self.growth_rate * days_passed
 
 
 class Bangs(HairSection):
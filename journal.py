@@ -0,0 +1,103 @@
+from __future__ import annotations
+import json
+import struct
+
+
+# A journal is a small binary file: a header holding the RNG seed, followed by a stream of records.
+# Every record starts with a one byte type and the tick it happened on.
+#   S: the game's simulation settings as JSON, always the first record
+#   K: the keys handled before that tick, in the order they were read
+#   C: a checksum of the world state at that tick
+#   E: the tick the session ended on
+MAGIC = b'HSSJ'
+# Bumped whenever a change alters how the simulation plays out or what checksums cover, so that older journals are
+# rejected instead of replaying wrongly
+VERSION = 2
+
+HEADER = struct.Struct('<4sHQ')  # magic, version, seed
+RECORD = struct.Struct('<cI')  # type, tick
+KEYS_LENGTH = struct.Struct('<H')
+SETTINGS_LENGTH = struct.Struct('<I')
+CHECKSUM = struct.Struct('<I')
+
+SETTINGS = b'S'
+KEYS = b'K'
+CHECKSUM_RECORD = b'C'
+END = b'E'
+
+
+class JournalError(Exception):
+    pass
+
+
+class JournalRecorder:
+
+    CHECKSUM_INTERVAL = 150  # ticks, ie. every 10 game minutes
+
+    def __init__(self, path: str, seed: int, settings: dict) -> None:
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed))
+
+        encoded = json.dumps(settings).encode('utf-8')
+        self.file.write(RECORD.pack(SETTINGS, 0) + SETTINGS_LENGTH.pack(len(encoded)) + encoded)
+
+    def record_keys(self, tick: int, keys: list[str]):
+        encoded = ''.join(keys).encode('utf-8')
+        self.file.write(RECORD.pack(KEYS, tick) + KEYS_LENGTH.pack(len(encoded)) + encoded)
+
+    def record_checksum(self, tick: int, checksum: int):
+        self.file.write(RECORD.pack(CHECKSUM_RECORD, tick) + CHECKSUM.pack(checksum))
+
+    def close(self, tick: int):
+        self.file.write(RECORD.pack(END, tick))
+        self.file.close()
+
+
+def read_journal(path: str):
+    """Returns the seed of a journal and a generator over its records as (type, tick, payload) tuples.
+
+    The payload is the settings dict for S records, the list of keys for K records, the checksum for C records and None for E records."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise JournalError(f'{path} is too short to be a journal')
+
+    magic, version, seed = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise JournalError(f'{path} is not a journal')
+    if version != VERSION:
+        raise JournalError(f'{path} is a version {version} journal, only version {VERSION} journals can be replayed')
+
+    def records():
+        offset = HEADER.size
+        while offset < len(data):
+            record_type, tick = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+
+            if record_type == SETTINGS:
+                length, = SETTINGS_LENGTH.unpack_from(data, offset)
+                offset += SETTINGS_LENGTH.size
+                yield record_type, tick, json.loads(data[offset:offset+length])
+                offset += length
+
+            elif record_type == KEYS:
+                length, = KEYS_LENGTH.unpack_from(data, offset)
+                offset += KEYS_LENGTH.size
+                yield record_type, tick, list(data[offset:offset+length].decode('utf-8'))
+                offset += length
+
+            elif record_type == CHECKSUM_RECORD:
+                checksum, = CHECKSUM.unpack_from(data, offset)
+                offset += CHECKSUM.size
+                yield record_type, tick, checksum
+
+            elif record_type == END:
+                yield record_type, tick, None
+                return
+
+            else:
+                raise JournalError(f'Unknown record {record_type!r} at byte {offset-RECORD.size} of {path}')
+
+    return seed, records()
@@ -0,0 +1,214 @@
+from __future__ import annotations
+from array import array
+import os
+import struct
+
+from events import EventBus, Arrived, Left, ServiceDone
+
+try:
+    import numpy as np
+except ImportError:  # Rollups fall back to plain Python loops
+    np = None
+
+
+# One row per event. amount is the price charged for services and, for 'leave', the length of the visit in game minutes.
+ACTIONS = ['arrive', 'leave', 'wash', 'neck roll', 'cape', 'brush', 'spray', 'scissors', 'clippers', 'razor',
+           'clean', 'blow dry', 'free', 'send off']
+ACTION_CODES = {action: i for i, action in enumerate(ACTIONS)}
+
+PRICES = {
+    'wash': 10.0,
+    'brush': 2.0,
+    'scissors': 4.0,  # per section
+    'clippers': 3.0,  # per section
+    'razor': 5.0,  # per section
+    'blow dry': 8.0,
+}
+BILLABLE = bytes(action in PRICES for action in ACTIONS)
+
+COLUMNS = [('tick', 'q'), ('customer', 'q'), ('action', 'B'), ('section', 'h'), ('chair', 'h'), ('amount', 'f')]
+
+# On disk, a ledger is a sequence of chunks, each a header followed by every column's data back to back
+CHUNK_HEADER = struct.Struct('<4sI')
+CHUNK_MAGIC = b'HSL2'  # HSLC chunks held sections and chairs in one byte each
+
+
+def _add_per_hour(a: list[float], b: list[float]) -> list[float]:
+    if len(a) < len(b): a, b = b, a
+    return [x + y for x, y in zip(a, b)] + a[len(b):]
+
+
+class ServiceLedger:
+    """An append-only record of every service, kept in columnar typed arrays and flushed to disk in chunks.
+
+    The rollups cover every row, the ones flushed to disk are folded into running totals as they're written."""
+
+    CHUNK_SIZE = 1 << 16  # rows kept in memory before they're flushed
+
+    def __init__(self, path: str|None = None, ticks_per_hour: int = 900) -> None:
+        self.path = path
+        self.ticks_per_hour = ticks_per_hour
+
+        self.tick = array('q')
+        self.customer = array('q')
+        self.action = array('B')
+        self.section = array('h')
+        self.chair = array('h')
+        self.amount = array('f')
+
+        self.flushed_rows = 0
+        self.flushed_revenue: list[float] = []  # per hour
+        self.flushed_services_per_chair: dict[int, int] = {}
+        self.flushed_visit_minutes = 0.0
+        self.flushed_visits = 0
+
+    def __len__(self) -> int:
+        return len(self.tick)
+
+    def subscribe(self, events: EventBus):
+        events.subscribe(Arrived, self.on_arrivals)
+        events.subscribe(Left, self.on_leaves)
+        events.subscribe(ServiceDone, self.on_services)
+
+    def on_arrivals(self, events: list[Arrived]):
+        for event in events:
+            self.record(event.tick, event.character.customer_id, 'arrive')
+
+    def on_leaves(self, events: list[Left]):
+        ticks_per_minute = self.ticks_per_hour / 60
+        for event in events:
+            self.record(event.tick, event.character.customer_id, 'leave', amount=event.visit_ticks/ticks_per_minute)
+
+    def on_services(self, events: list[ServiceDone]):
+        """One row per section for tools."""
+        for event in events:
+            if event.sections is None:
+                self.record(event.tick, event.customer_id, event.command.name, chair=event.chair)
+            else:
+                for section in event.sections:
+                    self.record(event.tick, event.customer_id, event.command.name, section, event.chair)
+
+    def record(self, tick: int, customer: int, action: str, section: int = -1, chair: int = -1, amount: float|None = None):
+        self.tick.append(tick)
+        self.customer.append(customer)
+        self.action.append(ACTION_CODES[action])
+        self.section.append(section)
+        self.chair.append(chair)
+        self.amount.append(PRICES.get(action, 0.0) if amount is None else amount)
+
+        if self.path is not None and len(self.tick) >= self.CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Appends the rows in memory to the ledger file as a chunk and clears them."""
+        if self.path is None or not len(self): return
+
+        with open(self.path, 'ab') as f:
+            f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(self)))
+            for name, _ in COLUMNS:
+                getattr(self, name).tofile(f)
+
+        self.flushed_revenue = _add_per_hour(self.flushed_revenue, self._revenue_per_hour())
+        for chair, count in self._services_per_chair().items():
+            self.flushed_services_per_chair[chair] = self.flushed_services_per_chair.get(chair, 0) + count
+        minutes, visits = self._visit_totals()
+        self.flushed_visit_minutes += minutes
+        self.flushed_visits += visits
+
+        self.flushed_rows += len(self)
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    @classmethod
+    def load(cls, path: str, ticks_per_hour: int = 900):
+        """Reads every chunk of a ledger file into one in-memory ledger for querying."""
+        ledger = cls(ticks_per_hour=ticks_per_hour)
+        size = os.path.getsize(path)
+
+        with open(path, 'rb') as f:
+            while f.tell() < size:
+                magic, rows = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+                if magic != CHUNK_MAGIC: raise ValueError(f'{path} is corrupt at byte {f.tell()-CHUNK_HEADER.size}')
+
+                for name, _ in COLUMNS:
+                    getattr(ledger, name).fromfile(f, rows)
+
+        return ledger
+
+    def _numpy_columns(self):
+        # Zero-copy views of the arrays
+        return {name: np.frombuffer(getattr(self, name), dtype=np.dtype(typecode)) if len(self) else np.zeros(0, typecode)
+                for name, typecode in COLUMNS}
+
+    def revenue_per_hour(self) -> list[float]:
+        """Money taken in each game hour since the ledger was started."""
+        return _add_per_hour(self.flushed_revenue, self._revenue_per_hour())
+
+    def services_per_chair(self) -> dict[int, int]:
+        """Number of billable services done in each haircutting chair."""
+        counts = dict(self.flushed_services_per_chair)
+        for chair, count in self._services_per_chair().items():
+            counts[chair] = counts.get(chair, 0) + count
+        return dict(sorted(counts.items()))
+
+    def average_visit_length(self) -> float:
+        """Average minutes customers spent in the salon, over the visits that have ended."""
+        minutes, visits = self._visit_totals()
+        minutes, visits = minutes + self.flushed_visit_minutes, visits + self.flushed_visits
+        return minutes/visits if visits else 0.0
+
+    # The rollups of the rows still in memory
+
+    def _revenue_per_hour(self) -> list[float]:
+        if not len(self): return []
+
+        if np is not None:
+            columns = self._numpy_columns()
+            billable = np.frombuffer(BILLABLE, dtype=np.uint8)[columns['action']]
+            return np.bincount(columns['tick'] // self.ticks_per_hour, weights=columns['amount']*billable).tolist()
+
+        revenue = [0.0] * (self.tick[-1]//self.ticks_per_hour + 1)
+        for tick, action, amount in zip(self.tick, self.action, self.amount):
+            if BILLABLE[action]:
+                revenue[tick//self.ticks_per_hour] += amount
+        return revenue
+
+    def _services_per_chair(self) -> dict[int, int]:
+        if np is not None:
+            columns = self._numpy_columns()
+            billable = np.frombuffer(BILLABLE, dtype=np.uint8)[columns['action']].astype(bool)
+            chairs = columns['chair'][billable & (columns['chair'] >= 0)]
+            return {chair: int(count) for chair, count in enumerate(np.bincount(chairs)) if count}
+
+        counts: dict[int, int] = {}
+        for action, chair in zip(self.action, self.chair):
+            if BILLABLE[action] and chair >= 0:
+                counts[chair] = counts.get(chair, 0) + 1
+        return counts
+
+    def _visit_totals(self) -> tuple[float, int]:
+        """Total minutes of the visits that ended and how many there were."""
+        if np is not None:
+            columns = self._numpy_columns()
+            lengths = columns['amount'][columns['action'] == ACTION_CODES['leave']]
+            return float(lengths.sum(dtype=np.float64)), len(lengths)
+
+        lengths = [amount for action, amount in zip(self.action, self.amount) if action == ACTION_CODES['leave']]
+        return sum(lengths), len(lengths)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    start_time = time.perf_counter()
+    ledger = ServiceLedger.load(sys.argv[1])
+    revenue = ledger.revenue_per_hour()
+    per_chair = ledger.services_per_chair()
+    average_visit = ledger.average_visit_length()
+    elapsed = time.perf_counter() - start_time
+
+    print(f'{len(ledger)} events over {len(revenue)} hours, queried in {elapsed*1000:.1f}ms')
+    print(f'Revenue: {sum(revenue):.2f} total, {max(revenue, default=0):.2f} in the best hour')
+    print(f'Services per chair: {per_chair}')
+    print(f'Average visit: {average_visit:.1f} minutes')
@@ -1,34 +1,111 @@
 from __future__ import annotations
 
 
+import argparse
 import curses
 import datetime
+import os
+import random
+import sys
 import time
+import zlib
 
 
 from windows import WorldWindow, HaircuttingChairWindow, ControlsWindow, ChatWindow
 from player import Player
 from character import Character
+from journal import JournalRecorder, JournalError, read_journal, SETTINGS, KEYS, CHECKSUM_RECORD
+from mood import MoodEngine
+from entities import EntityStore
+from arrivals import ArrivalEngine, ConstantRate, TimeOfDayRate
+from state_export import StatePublisher
+from spectator import SpectatorServer
+from ledger import ServiceLedger
+from metrics import SalonMetrics
+from profiler import Profiler, GCStats
+from memory_report import MemoryReporter
+from planner import PathPlanner
+from customers import CustomerStore
+from stylists import StylistPool
+from events import EventBus, EventLog, Said, Arrived, Left
+from pools import CustomerPools
+from spatial import SpatialHash
 
 
 class Game:
 
     TERMINAL_SIZE = (30, 100)
 
-    FPS = 15
-    GAMETIME_SECONDS_PER_FRAME = 60 / FPS  # seconds/frame
+    TICKS_PER_SECOND = 15  # simulation ticks per real second at game speed 1
+    GAMETIME_SECONDS_PER_TICK = 60 / TICKS_PER_SECOND  # seconds/tick
+    TICKS_PER_GAMETIME_MINUTE = round(60 / GAMETIME_SECONDS_PER_TICK)
+    TICKS_PER_GAMETIME_HOUR = 60 * TICKS_PER_GAMETIME_MINUTE
 
-    def __init__(self) -> None:
-        self.current_gametime = datetime.datetime(2024, 5, 1, 10, 0, 0)
+    MAX_FPS = 15  # rendering is capped independently of the simulation rate
+    MAX_TICKS_PER_FRAME = 8  # beyond this the simulation gives up on catching up
 
-        self.gametime_delta_per_frame = datetime.timedelta(seconds=self.GAMETIME_SECONDS_PER_FRAME)
+    GAME_SPEEDS = [0.25, 0.5, 1, 2, 4, 8]
+
+    # Everything besides the seed and input that changes how the simulation plays out, saved into journals
+    DEFAULT_SETTINGS = {
+        'arrivals_per_hour': 0,  # 0 means customers only come in when summoned
+        'time_of_day': False,  # whether arrivals follow a salon's day instead of a constant rate
+        'backpressure': 'turn away',
+        'door_capacity': 4,
+        'returning_share': 0.3,  # of customers who are returning ones, when there's a customer store
+        'stylists': 0,  # serving customers besides the player
+        'waiting_chairs': None,  # [x, y] of every chair, or None for the salon's own layout
+        'haircutting_chairs': None,
+        'hair_strands': 0,  # per section, 0 keeps hair at section level, otherwise see strands.py
+        'pool_size': 64,  # customers' objects kept to be reused when they leave, 0 turns pooling off
+        'neighbours': True,  # whether customers greet the customers next to them and mind crowds
+        'customers': None,  # in journals, the snapshot of the customer database a session started with, beside the journal
+    }
+
+    def __init__(self, seed: int|None = None, headless: bool = False, settings: dict|None = None, path_workers: int = 0) -> None:
+        # All of the simulation's randomness comes from here so that a session can be replayed from its seed
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.random = random.Random(self.seed)
+
+        self.headless = headless
+        self.path_workers = path_workers  # processes finding paths, or 0 to find them in the game's thread
+        self.settings = {**self.DEFAULT_SETTINGS, **(settings or {})}
+        self.recorder: JournalRecorder|None = None
+        self.export_path: str|None = None
+        self.publisher: StatePublisher|None = None
+        self.spectators: SpectatorServer|None = None
+        self.ledger: ServiceLedger|None = None
+        self.memory: MemoryReporter|None = None
+        self.customers: CustomerStore|None = None
+        self.event_log: EventLog|None = None
+
+        self.current_tick = 0
+        self.starting_gametime = self.current_gametime = datetime.datetime(2024, 5, 1, 10, 0, 0)
+
+        self.gametime_delta_per_tick = datetime.timedelta(seconds=self.GAMETIME_SECONDS_PER_TICK)
+        self.game_speed = 1
 
         self.player = Player()
         self.characters: list[Character] = []
+        self.entities = EntityStore()
+        self.nearby = SpatialHash()  # the player and every character by position
+        self.nearby.insert(self.player, *self.player.position)
+        self.customers_created = 0
+        self.moods = MoodEngine()
+        self.pools = CustomerPools(self.settings['pool_size'])
+        self.events = EventBus(self)
+        self.metrics = SalonMetrics(self)
+        self.metrics.subscribe(self.events)
 
         self.current_view = 'world'
 
+        self.arrivals: ArrivalEngine|None = None
+        self.stylists: StylistPool|None = None
+
         self.current_fps = 10
+        self.frame_count = 0
+
+        self.profiler = Profiler(self)
 
     def on_haircut_chair_interact(self, character: Character):
         self.haircutting_chair.character = character
@@ -36,15 +113,173 @@ class Game:
 
         self.haircutting_chair.refresh_needed = True
 
+    def new_customer_id(self) -> int:
+        self.customers_created += 1
+        return self.customers_created
+
     def add_character(self, character: Character):
         self.characters.append(character)
+        self.nearby.insert(character, *character.position)
+        self.events.emit(Arrived, character)
+
+    def remove_character(self, character: Character):
+        self.characters.remove(character)
+        self.events.emit(Left, character, self.current_tick - character.arrival_tick)
+
+        if self.customers is not None:
+            self.customers.record_visit(character, self.gametime_at(character.arrival_tick), self.current_gametime)
+
+        self.nearby.remove(character)
+        self.entities.remove(character.id)
+        character.mood.release()
+
+        # Nothing may still refer to the character once it's pooled, or it would follow the next customer to arrive
+        if self.stylists is not None:
+            self.stylists.forget(character)
+        if self.haircutting_chair.character is character:
+            self.haircutting_chair.character = None # type: ignore
+            if self.current_view == 'haircutting_chair':
+                self.current_view = 'world'
+        self.pools.release(character)
+
+    GREETING_RADIUS = 2  # steps, customers in neighbouring waiting chairs are 2 steps apart
+    CROWD_RADIUS = 1
+    CROWD_LIMIT = 3  # others within CROWD_RADIUS that make a customer feel crowded
+
+    def meet_neighbours(self):
+        """Once a game minute, customers sitting in waiting chairs greet the ones waiting next to them, and customers
+        with too many people around them, eg. in a crowd at the door, feel crowded."""
+        nearby = self.nearby
+        for character in self.characters:
+            if len(nearby.neighbours(character, self.CROWD_RADIUS)) >= self.CROWD_LIMIT:
+                character.mood.on_event('crowded')
+
+            if character.pending_actions or character.state != 'waiting': continue
+            neighbours = nearby.neighbours(character, self.GREETING_RADIUS)
+            for other in neighbours:
+                if (other is self.player or other.customer_id in character.greeted
+                        or other.pending_actions or other.state != 'waiting'): continue
+
+                character.greeted.add(other.customer_id)
+                other.greeted.add(character.customer_id)
+                character.mood.on_event('greeted')
+                other.mood.on_event('greeted')
+                self.events.emit(Said, '{}: Hi {}, have you been waiting long?', character.name, other.name)
+
+    def ticks_in(self, duration: datetime.timedelta) -> int:
+        return duration // self.gametime_delta_per_tick
+
+    def gametime_at(self, tick: int) -> datetime.datetime:
+        return self.starting_gametime + tick*self.gametime_delta_per_tick
     
+    def set_game_speed(self, game_speed: float):
+        self.game_speed = game_speed
+        # Deadlines are rescheduled from now so that a speed change doesn't cause a burst of catch-up ticks
+        self.next_tick_time = time.perf_counter()
+
+    def change_game_speed(self, steps: int):
+        index = min(range(len(self.GAME_SPEEDS)), key=lambda i: abs(self.GAME_SPEEDS[i]-self.game_speed))
+        index = min(max(index+steps, 0), len(self.GAME_SPEEDS)-1)
+        self.set_game_speed(self.GAME_SPEEDS[index])
+
+    def tick(self):
+        self.planner.collect()
+
+        if self.arrivals is not None:
+            self.arrivals.update()
+
+        # Only characters whose next action is due are visited
+        for entity in self.entities.due(self.current_tick):
+            character = self.entities.characters[entity]
+            if character is not None:
+                character.update()
+
+        if self.stylists is not None:
+            self.stylists.update()
+
+        # Subscribers catch up on this tick before the metrics are sampled
+        self.events.deliver()
+
+        if self.current_tick % self.TICKS_PER_GAMETIME_MINUTE == 0:
+            if self.settings['neighbours']:
+                self.meet_neighbours()
+            self.moods.step(crowded=all(occupant is not None for occupant in self.world.waiting_chairs.values()))
+            self.metrics.sample()
+
+        if self.current_tick % self.TICKS_PER_GAMETIME_HOUR == 0 and self.current_tick:
+            if self.events.wants(Said):
+                self.events.emit(Said, self.metrics.summary())
+
+            if self.customers is not None:
+                self.customers.flush()
+
+        self.planner.submit()
+
+        self.current_gametime += self.gametime_delta_per_tick
+        self.current_tick += 1
+
+        if self.recorder is not None and self.current_tick % self.recorder.CHECKSUM_INTERVAL == 0:
+            self.recorder.record_checksum(self.current_tick, self.checksum())
+
+        if self.publisher is not None:
+            self.publisher.publish()
+
+        if self.memory is not None:
+            self.memory.update()
+
+    def checksum(self) -> int:
+        """A CRC of everything the simulation depends on, used to check that a replay hasn't diverged."""
+        state = [self.current_tick, tuple(self.player.position), self.current_view]
+        if self.arrivals is not None:
+            state.append(str(self.arrivals))
+        state.append(bytes(self.moods.moods))
+        for character in self.characters:
+            state.append((character.name, character.age, tuple(character.position), len(character.pending_actions),
+                          character.has_cape, character.has_neck_roll,
+                          tuple(section._length for section in character.hair.sections)))
+
+        for chairs in (self.world.waiting_chairs, self.world.haircutting_chairs):
+            state.append(tuple(self.characters.index(occupant) if occupant in self.characters else -1
+                               for occupant in chairs.values()))
+
+        return zlib.crc32(repr(state).encode())
+
     def iter_loop(self):
+        """Handles input, runs as many fixed simulation ticks as are due and renders if a frame is due."""
         self.controls.update()
 
-        [character.update() for character in self.characters]
+        now = time.perf_counter()
+        seconds_per_tick = 1/(self.TICKS_PER_SECOND*self.game_speed)
+
+        ticks_run = 0
+        while self.next_tick_time <= now and ticks_run < self.MAX_TICKS_PER_FRAME:
+            self.tick()
+            self.next_tick_time += seconds_per_tick
+            ticks_run += 1
 
-        self.draw()
+        # Events from key presses, eg. services done in the haircutting chair, are shown even while no tick is due
+        self.events.deliver()
+
+        if self.next_tick_time <= now:
+            # Too far behind (eg. the process was suspended), drop the backlog instead of spiralling
+            self.next_tick_time = now + seconds_per_tick
+
+        if self.next_frame_time <= now:
+            self.frame_count += 1
+            self.draw()
+
+            if self.spectators is not None and self.spectators.clients:
+                self.spectators.publish(self.render_panels())
+
+            self.current_fps = 1/max(now - self.last_frame_time, 1e-6)
+            self.last_frame_time = now
+
+            # Frames that are already late are skipped rather than rendered back to back
+            self.next_frame_time += 1/self.MAX_FPS
+            if self.next_frame_time <= now:
+                self.next_frame_time = now + 1/self.MAX_FPS
+
+        time.sleep(max(min(self.next_tick_time, self.next_frame_time) - time.perf_counter(), 0))
 
     def draw(self):
         if self.current_view == 'world':
@@ -55,19 +290,56 @@ class Game:
         self.chat.draw()
         #self.stdscr.refresh()
 
-    def run(self, stdscr: curses.window):
-        curses.resizeterm(*self.TERMINAL_SIZE)
-        curses.noecho()
-        curses.curs_set(0)
+    def render_panels(self) -> dict[str, list[str]]:
+        return {'world': self.world.render_lines(), 'chat': self.chat.render_lines(), 'controls': self.controls.render_lines()}
 
-        SPF = 1/self.FPS
-        self.stdscr = stdscr
+    def setup(self):
+        if self.customers is not None:
+            self.customers_created = self.customers.max_id()
+
+            # The salon reopens the morning after it was last open, so returning customers have been away for a while
+            last_visit = self.customers.last_visit()
+            if last_visit is not None and last_visit >= self.starting_gametime:
+                reopening = datetime.datetime.combine(last_visit.date() + datetime.timedelta(days=1), self.starting_gametime.time())
+                self.starting_gametime = self.current_gametime = reopening
 
         self.world = WorldWindow(self)
         self.controls = ControlsWindow(self)
         self.chat = ChatWindow(self)
         self.haircutting_chair = HaircuttingChairWindow(self)
-        
+        self.planner = PathPlanner(self, self.path_workers)
+
+        # The chat and the world window only listen when they're drawn, so headless runs never format chat lines
+        if not self.headless:
+            self.chat.subscribe(self.events)
+            self.world.subscribe(self.events)
+        if self.ledger is not None:
+            self.ledger.subscribe(self.events)
+
+        if self.settings['arrivals_per_hour'] > 0:
+            if self.settings['time_of_day']:
+                profile = TimeOfDayRate.salon_day(self.settings['arrivals_per_hour'])
+            else:
+                profile = ConstantRate(self.settings['arrivals_per_hour'])
+
+            self.arrivals = ArrivalEngine(self, profile, self.settings['backpressure'], self.settings['door_capacity'])
+
+        if self.settings['stylists'] > 0:
+            self.stylists = StylistPool(self, self.settings['stylists'])
+
+        if self.export_path is not None:
+            self.publisher = StatePublisher(self, self.export_path)
+
+        if self.memory is not None:
+            self.memory.start()
+
+    def run(self, stdscr: curses.window):
+        curses.resizeterm(*self.TERMINAL_SIZE)
+        curses.noecho()
+        curses.curs_set(0)
+
+        self.stdscr = stdscr
+        self.setup()
 
         # DEBUG
         # Spawn character on haircutting_chair and open haircutting view
@@ -82,16 +354,209 @@ class Game:
         # self.haircutting_chair.tool_mode = self.haircutting_chair.LAST_TOOL_MODE[self.haircutting_chair.chosen_tool]
 
         self.running = True
-        last_time = time.time()
-        while self.running:
-            self.iter_loop()
+        self.next_tick_time = self.next_frame_time = self.last_frame_time = time.perf_counter()
+        try:
+            while self.running:
+                self.iter_loop()
+
+        finally:
+            if self.profiler.running:
+                self.profiler.stop()
+
+            self.events.deliver()
+            self.planner.close()
+
+            if self.customers is not None:
+                self.customers.close()
+
+            if self.recorder is not None:
+                self.recorder.close(self.current_tick)
+
+            if self.spectators is not None:
+                self.spectators.stop()
+
+            if self.publisher is not None:
+                self.publisher.close()
+
+            if self.ledger is not None:
+                self.ledger.flush()
+
+            if self.memory is not None:
+                self.memory.stop()
+
+            if self.event_log is not None:
+                self.event_log.close()
+
+    def run_headless(self, ticks: int):
+        self.setup()
+        self.running = True
+        for _ in range(ticks):
+            self.tick()
+
+        if self.publisher is not None:
+            self.publisher.close()
+
+        if self.ledger is not None:
+            self.ledger.flush()
+
+        if self.memory is not None:
+            self.memory.stop()
+
+        if self.customers is not None:
+            self.customers.close()
+
+        if self.event_log is not None:
+            self.event_log.close()
+
+
+def replay(path: str) -> bool:
+    """Plays a journal back through a headless game as fast as possible.
+
+    Returns whether every recorded checksum matched."""
+    seed, records = read_journal(path)
+
+    record_type, _, settings = next(records)
+    if record_type != SETTINGS: raise JournalError(f'{path} does not start with the game\'s settings')
+
+    game = Game(seed=seed, headless=True, settings=settings)
+    if game.settings['customers'] is not None:
+        game.customers = CustomerStore.from_snapshot(os.path.join(os.path.dirname(path), game.settings['customers']))
+    game.setup()
+    game.running = True
+
+    mismatches = 0
+    checksums = 0
+    start_time = time.perf_counter()
+    for record_type, tick, payload in records:
+        while game.current_tick < tick:
+            game.tick()
+
+        if record_type == KEYS:
+            game.controls.handle_keys(payload)
+
+        elif record_type == CHECKSUM_RECORD:
+            checksums += 1
+            checksum = game.checksum()
+            if checksum != payload:
+                mismatches += 1
+                print(f'Tick {tick}: checksum {checksum:08x} does not match recorded {payload:08x}')
+
+    elapsed = time.perf_counter() - start_time
+    print(f'Replayed {game.current_tick} ticks in {elapsed:.3f}s '
+          f'({game.current_tick/max(elapsed, 1e-9):.0f} ticks/s), '
+          f'{checksums-mismatches}/{checksums} checksums matched')
+
+    return mismatches == 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='A Haircut Game!')
+    parser.add_argument('--seed', type=int, help='seed for the game\'s randomness')
+    parser.add_argument('--record', metavar='JOURNAL', help='record the seed and every key pressed to a journal')
+    parser.add_argument('--replay', metavar='JOURNAL', help='replay a journal headlessly and check its checksums')
+    parser.add_argument('--export', metavar='FILE', help='publish the live state of the salon to a memory mapped file every tick')
+    parser.add_argument('--spectate', metavar='ADDRESS',
+                        help='let others watch the game with spectator.py, on host:port or unix:/path/to.sock')
+    parser.add_argument('--ledger', metavar='FILE', help='append every service done to a ledger file, see ledger.py')
+    parser.add_argument('--profile-mode', choices=Profiler.MODES, default='sampling',
+                        help='how the game is profiled when P is pressed')
+    parser.add_argument('--memory-report', type=int, metavar='MINUTES',
+                        help='report what memory is used by every this many game minutes, using tracemalloc')
+    parser.add_argument('--event-log', metavar='FILE', help='append every simulation event to a text file, for debugging')
+    parser.add_argument('--memory-json', metavar='FILE', help='write the memory reports to a JSON file on exit')
+    parser.add_argument('--memory-frames', type=int, default=1, metavar='N',
+                        help='frames of every allocation\'s stack to trace for the memory reports, more are slower')
+    parser.add_argument('--path-workers', type=int, default=1, metavar='N',
+                        help='processes finding paths for customers, 0 to find them in the game\'s thread')
+    parser.add_argument('--customers', metavar='FILE',
+                        help='keep customers in a database so that they come back, in this session and later ones')
+    parser.add_argument('--headless', type=float, metavar='DAYS', help='simulate this many game days without a terminal')
+    parser.add_argument('--arrivals', type=float, default=0, metavar='PER_HOUR',
+                        help='customers arriving on their own per game hour (at the peak, with --time-of-day)')
+    parser.add_argument('--stylists', type=int, default=0, metavar='N', help='stylists serving customers besides you')
+    parser.add_argument('--pool-size', type=int, default=Game.DEFAULT_SETTINGS['pool_size'], metavar='N',
+                        help='customers kept to be reused after they leave, 0 allocates every customer anew')
+    parser.add_argument('--gc-stats', action='store_true', help='report garbage collections after a headless run')
+    parser.add_argument('--hair-strands', type=int, default=0, metavar='N',
+                        help='model hair as N strands per section, for cut profiles (needs numpy)')
+    parser.add_argument('--time-of-day', action='store_true', help='vary arrivals through the day like a real salon')
+    parser.add_argument('--backpressure', choices=ArrivalEngine.BACKPRESSURE_POLICIES,
+                        default='turn away', help='what happens to arrivals while the waiting chairs are full')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.replay:
+        sys.exit(0 if replay(args.replay) else 1)
+
+    settings = {
+        'arrivals_per_hour': args.arrivals,
+        'time_of_day': args.time_of_day,
+        'backpressure': args.backpressure,
+        'stylists': args.stylists,
+        'hair_strands': args.hair_strands,
+        'pool_size': args.pool_size,
+    }
+
+    if args.headless:
+        game = Game(seed=args.seed, headless=True, settings=settings)
+        game.export_path = args.export
+        if args.ledger:
+            game.ledger = ServiceLedger(args.ledger, Game.TICKS_PER_GAMETIME_HOUR)
+        if args.memory_report:
+            game.memory = MemoryReporter(game, args.memory_report, args.memory_json, args.memory_frames)
+        if args.customers:
+            game.customers = CustomerStore(args.customers)
+        if args.event_log:
+            game.event_log = EventLog(game.events, args.event_log)
+        ticks = round(args.headless*24*60*60/Game.GAMETIME_SECONDS_PER_TICK)
+
+        gc_stats = GCStats() if args.gc_stats else None
+        if gc_stats is not None:
+            gc_stats.start()
+
+        start_time = time.perf_counter()
+        game.run_headless(ticks)
+        elapsed = time.perf_counter() - start_time
 
-            time.sleep(max(SPF-time.time()+last_time, 0))
-            self.current_fps = 1/(time.time() - last_time)
-            last_time = time.time()
+        if gc_stats is not None:
+            gc_stats.stop()
 
-            self.current_gametime += self.gametime_delta_per_frame
+        print(f'Simulated {ticks} ticks in {elapsed:.3f}s ({ticks/max(elapsed, 1e-9):.0f} ticks/s)')
+        if game.arrivals is not None:
+            print(f'Arrivals: {game.arrivals}')
+        if game.stylists is not None:
+            print(f'Stylists: {game.stylists}')
+        print(game.metrics.summary())
+        if gc_stats is not None:
+            print(f'Pools: {game.pools}')
+            print(gc_stats.summary(ticks))
+        if game.memory is not None and game.memory.reports:
+            print(MemoryReporter.describe(game.memory.reports[-1]))
+        sys.exit()
 
+    game = Game(seed=args.seed, settings=settings, path_workers=args.path_workers)
+    game.export_path = args.export
+    game.profiler.mode = args.profile_mode
+    if args.memory_report:
+        game.memory = MemoryReporter(game, args.memory_report, args.memory_json, args.memory_frames)
+    if args.ledger:
+        game.ledger = ServiceLedger(args.ledger, Game.TICKS_PER_GAMETIME_HOUR)
+    if args.customers:
+        game.customers = CustomerStore(args.customers)
+    if args.event_log:
+        game.event_log = EventLog(game.events, args.event_log)
+    if args.spectate:
+        game.spectators = SpectatorServer(args.spectate)
+        game.spectators.start()
+    if args.record:
+        if game.customers is not None:
+            # The session changes the database as customers leave, so it's replayed against a copy from before it
+            snapshot = args.record + '.customers.db'
+            game.customers.snapshot(snapshot)
+            game.settings['customers'] = os.path.basename(snapshot)
+        game.recorder = JournalRecorder(args.record, game.seed, game.settings)
 
-game = Game()
-curses.wrapper(game.run)
+    curses.wrapper(game.run)
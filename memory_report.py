@@ -0,0 +1,168 @@
+from __future__ import annotations
+import inspect
+import json
+import os
+import tracemalloc
+
+from character import Character
+from utils import get_path, get_directions
+from windows import ChatWindow
+from events import Said
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+
+
+# Allocations are charged to the innermost frame in the game's own code, first by function and then by file
+SUBSYSTEM_FUNCTIONS = {
+    'paths': [Character.goto_position, get_path, get_directions],
+    'chat': [ChatWindow.add_dialogue],
+}
+SUBSYSTEM_FILES = {
+    'character.py': 'characters',
+    'planner.py': 'paths',
+    'hair.py': 'hair',
+    'mood.py': 'moods',
+    'entities.py': 'entities',
+    'arrivals.py': 'arrivals',
+    'services.py': 'services',
+    'ledger.py': 'ledger',
+    'metrics.py': 'metrics',
+    'journal.py': 'journal',
+    'windows.py': 'windows',
+    'spectator.py': 'spectators',
+    'state_export.py': 'export',
+    'events.py': 'events',
+    'pools.py': 'pools',
+}
+
+
+def _function_ranges() -> dict[str, list[tuple[int, int, str]]]:
+    ranges: dict[str, list[tuple[int, int, str]]] = {}
+    for subsystem, functions in SUBSYSTEM_FUNCTIONS.items():
+        for function in functions:
+            lines, first = inspect.getsourcelines(function)
+            ranges.setdefault(inspect.getsourcefile(function), []).append((first, first+len(lines), subsystem)) # type: ignore
+    return ranges
+
+
+class MemoryReporter:
+    """Takes tracemalloc snapshots every few game minutes and reports what the retained memory is used by.
+
+    Each report has the bytes held by each subsystem, bytes per customer in the salon and the growth since the last
+    report. If retained memory keeps growing while the number of customers doesn't, a leak is reported in the chat.
+
+    Tracing every allocation's stack costs more the deeper it goes, so by default only the innermost frame is kept.
+    Allocations made in the standard library then count as 'other' rather than as the subsystem that called it."""
+
+    LEAK_REPORTS = 3  # reports in a row that have to grow without more customers
+    LEAK_MIN_GROWTH = 64*1024  # bytes per report, so that noise doesn't count as growth
+
+    def __init__(self, game: Game, interval_minutes: int = 60, export_path: str|None = None, frames: int = 1) -> None:
+        self.game = game
+        self.export_path = export_path
+        self.interval_ticks = interval_minutes*game.TICKS_PER_GAMETIME_MINUTE
+        self.frames = frames
+
+        self.root = os.path.dirname(os.path.abspath(__file__))
+        self.function_ranges = _function_ranges()
+        self.subsystems: dict[tuple[str, int], str|None] = {}  # cache of the subsystem of every frame seen
+
+        self.reports: list[dict] = []
+        self.growing_reports = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        """Stops tracing and writes the reports to export_path, if there is one."""
+        tracemalloc.stop()
+        if self.export_path is not None:
+            self.export(self.export_path)
+
+    def subsystem_of(self, filename: str, lineno: int) -> str|None:
+        """The subsystem a line of code belongs to, or None if it isn't part of the game."""
+        key = (filename, lineno)
+        if key not in self.subsystems:
+            subsystem = None
+            if os.path.dirname(filename) == self.root:
+                for first, last, name in self.function_ranges.get(filename, []):
+                    if first <= lineno < last:
+                        subsystem = name
+                        break
+                else:
+                    subsystem = SUBSYSTEM_FILES.get(os.path.basename(filename), 'other')
+
+            self.subsystems[key] = subsystem
+        return self.subsystems[key]
+
+    def take_snapshot(self) -> dict:
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+
+        by_subsystem: dict[str, int] = {}
+        for trace in snapshot.traces:
+            subsystem = 'other'
+            # Innermost frame first
+            for frame in reversed(trace.traceback):
+                found = self.subsystem_of(frame.filename, frame.lineno)
+                if found is not None:
+                    subsystem = found
+                    break
+            by_subsystem[subsystem] = by_subsystem.get(subsystem, 0) + trace.size
+
+        game = self.game
+        total = sum(by_subsystem.values())
+        customers = len(game.characters)
+        previous = self.reports[-1] if self.reports else None
+
+        report = {
+            'tick': game.current_tick,
+            'gametime': game.current_gametime.isoformat(),
+            'customers': customers,
+            'total_bytes': total,
+            'bytes_per_customer': total / max(customers, 1),
+            'growth_bytes': total - previous['total_bytes'] if previous else 0,
+            'by_subsystem': dict(sorted(by_subsystem.items(), key=lambda item: -item[1])),
+            'growth_by_subsystem': {subsystem: size - previous['by_subsystem'].get(subsystem, 0)
+                                    for subsystem, size in by_subsystem.items()} if previous else {},
+            'leak_suspected': False,
+        }
+
+        if previous is not None and report['growth_bytes'] > self.LEAK_MIN_GROWTH and customers <= previous['customers']:
+            self.growing_reports += 1
+        else:
+            self.growing_reports = 0
+        report['leak_suspected'] = self.growing_reports >= self.LEAK_REPORTS
+
+        self.reports.append(report)
+        return report
+
+    def update(self):
+        """Called every tick, takes a snapshot and reports on it every interval."""
+        if self.game.current_tick % self.interval_ticks: return
+
+        report = self.take_snapshot()
+        events = self.game.events
+        if events.wants(Said):
+            events.emit(Said, self.describe(report))
+
+        if report['leak_suspected']:
+            growth = report['growth_by_subsystem']
+            culprit = max(growth, key=growth.get) # type: ignore
+            events.emit(Said, '[Memory] Possible leak: memory has grown for {} reports without more customers, mostly in {}',
+                        self.growing_reports, culprit)
+
+    @staticmethod
+    def describe(report: dict) -> str:
+        largest = ', '.join(f'{subsystem} {size/1024:.0f}KB' for subsystem, size in list(report['by_subsystem'].items())[:3])
+        return (f'[Memory] {report["total_bytes"]/1024:.0f}KB ({report["growth_bytes"]/1024:+.0f}KB), '
+                f'{report["bytes_per_customer"]/1024:.1f}KB per customer; {largest}')
+
+    def export(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.reports, f, indent=1)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import math
+
+from events import EventBus, Arrived, Seated, TurnedAway, StateChanged
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+
+
+class QuantileSketch:
+    """Streaming quantiles with a bounded relative error, in memory that only grows with the log of the value range.
+
+    Values are counted in logarithmically sized buckets, so any quantile is off by at most relative_accuracy."""
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0  # values too small to have a bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+        if value < 1e-6:
+            self.zero_count += 1
+        else:
+            bucket = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count: return 0.0
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen: return 0.0
+
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if rank < seen:
+                # The middle of the bucket, in the sense that minimises the relative error
+                return 2 * self.gamma**bucket / (self.gamma + 1)
+
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class WindowedCounter:
+    """A sum over the last few time buckets, eg. the last 24 game hours, kept in a fixed ring of counts."""
+
+    def __init__(self, bucket_ticks: int, buckets: int) -> None:
+        self.bucket_ticks = bucket_ticks
+        self.counts = [0.0] * buckets
+        self.bucket_starts = [-1] * buckets
+
+    def add(self, tick: int, amount: float = 1):
+        bucket = tick // self.bucket_ticks
+        i = bucket % len(self.counts)
+        if self.bucket_starts[i] != bucket:
+            self.bucket_starts[i] = bucket
+            self.counts[i] = 0
+        self.counts[i] += amount
+
+    def total(self, tick: int) -> float:
+        oldest = tick // self.bucket_ticks - len(self.counts) + 1
+        return sum(count for count, bucket in zip(self.counts, self.bucket_starts) if bucket >= oldest)
+
+
+class SalonMetrics:
+    """Throughput of the salon: how long customers wait, how busy the haircutting chairs are and how many are turned away.
+
+    Everything is kept in sketches and windowed counters, so memory stays the same however many customers come through."""
+
+    WINDOW_HOURS = 24
+
+    def __init__(self, game: Game) -> None:
+        self.game = game
+        self.ticks_per_minute = game.TICKS_PER_GAMETIME_MINUTE
+        hour = game.TICKS_PER_GAMETIME_HOUR
+
+        self.wait_minutes = QuantileSketch()  # from sitting down in a waiting chair to being called to a haircutting chair
+        self.seated: dict[int, int] = {}  # tick every customer in the queue sat down on, by customer id
+        self.service_minutes = QuantileSketch()  # time spent in a haircutting chair
+        self.queue_length = QuantileSketch()  # sampled every game minute
+
+        self.arrived = WindowedCounter(hour, self.WINDOW_HOURS)
+        self.served = WindowedCounter(hour, self.WINDOW_HOURS)
+        self.turned_away = WindowedCounter(hour, self.WINDOW_HOURS)
+        self.chair_busy_ticks = WindowedCounter(hour, self.WINDOW_HOURS)
+
+        self.total_arrived = 0
+        self.total_served = 0
+        self.total_turned_away = 0
+
+        self.waiting = 0
+        self.being_served = 0
+
+    def subscribe(self, events: EventBus):
+        events.subscribe(Arrived, self.on_arrivals)
+        events.subscribe(TurnedAway, self.on_turned_away)
+        events.subscribe(Seated, self.on_seated)
+        events.subscribe(StateChanged, self.on_state_changes)
+
+    def on_arrivals(self, events: list[Arrived]):
+        self.total_arrived += len(events)
+        for event in events:
+            self.arrived.add(event.tick)
+
+    def on_turned_away(self, events: list[TurnedAway]):
+        self.total_turned_away += len(events)
+        for event in events:
+            self.turned_away.add(event.tick)
+
+    def on_seated(self, events: list[Seated]):
+        for event in events:
+            # Customers called over on the tick they sat down have already left the queue
+            if event.character.state == 'waiting':
+                self.seated[event.character.customer_id] = event.tick
+
+    def on_state_changes(self, events: list[StateChanged]):
+        for event in events:
+            old_state, new_state = event.old_state, event.new_state
+
+            if old_state == 'waiting':
+                self.waiting -= 1
+                # Walking to the waiting chair isn't waiting, customers called before reaching it didn't wait at all
+                seated = self.seated.pop(event.character.customer_id, event.tick)
+                if new_state == 'being served':
+                    self.wait_minutes.add((event.tick - seated) / self.ticks_per_minute)
+
+            elif old_state == 'being served':
+                self.being_served -= 1
+                self.total_served += 1
+                self.served.add(event.tick)
+                self.service_minutes.add(event.ticks_in_old_state / self.ticks_per_minute)
+
+            if new_state == 'waiting':
+                self.waiting += 1
+            elif new_state == 'being served':
+                self.being_served += 1
+
+    def sample(self):
+        """Called once per game minute."""
+        self.queue_length.add(self.waiting)
+        # Sampled rather than added up when customers leave, so that long haircuts count while they're happening
+        self.chair_busy_ticks.add(self.game.current_tick, self.being_served*self.ticks_per_minute)
+
+    def chair_utilisation(self) -> float:
+        tick = self.game.current_tick
+        window_ticks = min(tick, self.WINDOW_HOURS*self.game.TICKS_PER_GAMETIME_HOUR) or 1
+        busy = self.chair_busy_ticks.total(tick)
+        return min(busy / (window_ticks*len(self.game.world.haircutting_chairs)), 1.0)
+
+    def snapshot(self) -> dict:
+        tick = self.game.current_tick
+        return {
+            'arrived': self.total_arrived,
+            'served': self.total_served,
+            'turned away': self.total_turned_away,
+            'arrived last 24h': self.arrived.total(tick),
+            'served last 24h': self.served.total(tick),
+            'turned away last 24h': self.turned_away.total(tick),
+            'waiting now': self.waiting,
+            'in haircutting chairs now': self.being_served,
+            'wait minutes p50': self.wait_minutes.quantile(0.5),
+            'wait minutes p95': self.wait_minutes.quantile(0.95),
+            'service minutes p50': self.service_minutes.quantile(0.5),
+            'queue length mean': self.queue_length.mean,
+            'queue length p95': self.queue_length.quantile(0.95),
+            'chair utilisation': self.chair_utilisation(),
+        }
+
+    def summary(self) -> str:
+        tick = self.game.current_tick
+        return (f'[Stats] {self.served.total(tick):.0f} served, {self.turned_away.total(tick):.0f} turned away in 24h; '
+                f'wait p50 {self.wait_minutes.quantile(0.5):.0f}m p95 {self.wait_minutes.quantile(0.95):.0f}m; '
+                f'queue {self.queue_length.mean:.1f}; chairs {self.chair_utilisation():.0%} busy')
@@ -1,18 +1,138 @@
+from __future__ import annotations
+from operator import add
 
 
+MOODS = ['Furious', 'Annoyed', 'Impatient', 'Calm', 'Happy', 'Delighted']
 
-class Mood:
+# Ordered by priority, when several events happen to a character in the same step only the highest priority one counts
+EVENTS = ['none', 'greeted', 'crowded', 'waited too long', 'seated', 'bad haircut', 'good haircut']
+
+# The mood a character moves to for every event, one row per mood
+TRANSITIONS = {
+    #             none         greeted      crowded      waited too long  seated       bad haircut  good haircut
+    'Furious':   ['Furious',   'Furious',   'Furious',   'Furious',       'Annoyed',   'Furious',   'Annoyed'],
+    'Annoyed':   ['Annoyed',   'Annoyed',   'Furious',   'Furious',       'Impatient', 'Furious',   'Calm'],
+    'Impatient': ['Impatient', 'Impatient', 'Annoyed',   'Annoyed',       'Calm',      'Annoyed',   'Happy'],
+    'Calm':      ['Calm',      'Happy',     'Impatient', 'Impatient',     'Calm',      'Impatient', 'Happy'],
+    'Happy':     ['Happy',     'Happy',     'Calm',      'Calm',          'Happy',     'Calm',      'Delighted'],
+    'Delighted': ['Delighted', 'Delighted', 'Happy',     'Happy',         'Delighted', 'Happy',     'Delighted'],
+}
+
+MOOD_CODES = {mood: i for i, mood in enumerate(MOODS)}
+EVENT_CODES = {event: i for i, event in enumerate(EVENTS)}
+
+NOT_WAITING = 255
+
+
+def _translation(mapping: dict[int, int]) -> bytes:
+    """A bytes.translate table sending every byte to itself unless it's in the mapping."""
+    return bytes(mapping.get(i, i) for i in range(256))
+
+
+# Moods are stored as mood*len(EVENTS) so that adding an event code gives a unique byte per (mood, event) pair,
+# which this table then translates straight into the next (premultiplied) mood.
+TRANSITION_TABLE = _translation({
+    MOOD_CODES[mood]*len(EVENTS) + EVENT_CODES[event]: MOOD_CODES[next_mood]*len(EVENTS)
+    for mood, next_moods in TRANSITIONS.items()
+    for event, next_mood in zip(EVENTS, next_moods)
+})
+
+
+class MoodEngine:
+    """Holds the moods of every character in compact arrays and advances all of them at once.
+
+    A step runs once per game minute. Each step works on whole arrays with bytes.translate and map, so it doesn't run
+    any Python code per character."""
+
+    PATIENCE_MINUTES = 20  # how long a character waits before getting impatient, and again after that
+
+    COUNT_DOWN = _translation({i: i-1 for i in range(1, NOT_WAITING)})
+    PATIENCE_EXPIRED = _translation({0: EVENT_CODES['waited too long'], **{i: 0 for i in range(1, 256)}})
+    WAITING_WHILE_CROWDED = _translation({**{i: EVENT_CODES['crowded'] for i in range(NOT_WAITING)}, NOT_WAITING: 0})
+    RESET_PATIENCE = _translation({0: PATIENCE_MINUTES})
 
     def __init__(self) -> None:
-        pass
+        self.moods = bytearray()  # premultiplied mood of every row
+        self.events = bytearray()  # strongest event posted to every row since the last step
+        self.patience = bytearray()  # minutes left before a waiting row gets impatient, NOT_WAITING otherwise
+
+        self.free_rows: list[int] = []
+
+    def add(self, mood: str = 'Happy') -> int:
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            row = len(self.moods)
+            self.moods.append(0)
+            self.events.append(0)
+            self.patience.append(NOT_WAITING)
+
+        self.moods[row] = MOOD_CODES[mood]*len(EVENTS)
+        return row
+
+    def remove(self, row: int):
+        self.events[row] = 0
+        self.patience[row] = NOT_WAITING
+        self.free_rows.append(row)
+
+    def __len__(self) -> int:
+        return len(self.moods) - len(self.free_rows)
+
+    def get_mood(self, row: int) -> str:
+        return MOODS[self.moods[row]//len(EVENTS)]
+
+    def post(self, row: int, event: str):
+        self.events[row] = max(self.events[row], EVENT_CODES[event])
+
+    def start_waiting(self, row: int):
+        self.patience[row] = self.PATIENCE_MINUTES
+
+    def stop_waiting(self, row: int):
+        self.patience[row] = NOT_WAITING
+
+    def step(self, crowded: bool = False):
+        self.patience = self.patience.translate(self.COUNT_DOWN)
+
+        events = bytes(map(max, self.events, self.patience.translate(self.PATIENCE_EXPIRED)))
+        if crowded:
+            events = bytes(map(max, events, self.patience.translate(self.WAITING_WHILE_CROWDED)))
+
+        self.moods = bytearray(bytes(map(add, self.moods, events)).translate(TRANSITION_TABLE))
+
+        self.patience = self.patience.translate(self.RESET_PATIENCE)
+        self.events = bytearray(len(self.events))
+
+
+class Mood:
+    """A view of one character's row in a MoodEngine."""
+
+    def __init__(self, engine: MoodEngine, row: int) -> None:
+        self.engine = engine
+        self.row = row
 
     def __str__(self) -> str:
         return self.current_mood
-    
+
     @property
     def current_mood(self):
-        return 'Happy'
-    
+        return self.engine.get_mood(self.row)
+
+    def on_event(self, event: str):
+        self.engine.post(self.row, event)
+
+    def start_waiting(self):
+        self.engine.start_waiting(self.row)
+
+    def stop_waiting(self):
+        self.engine.stop_waiting(self.row)
+
+    def release(self):
+        self.engine.remove(self.row)
+
+    def reset(self, mood: str = 'Happy'):
+        """Takes a new row for a Mood that was released, so that it can be reused."""
+        self.row = self.engine.add(mood)
+
     @classmethod
-    def new(cls):
-        return cls()
\ No newline at end of file
+    def new(cls, engine: MoodEngine, mood: str = 'Happy'):
+        return cls(engine, engine.add(mood))
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from utils import get_directions
+from vector import Vector2
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+    from windows import WorldWindow
+
+
+class WalkableGrid:
+    """A read-only copy of where characters can walk, small enough to send to worker processes.
+
+    Like WorldWindow.is_traversable, everything outside the salon is walkable."""
+
+    def __init__(self, world: WorldWindow) -> None:
+        height = len(world.SALON) + 2
+        width = max(len(line) for line in world.SALON) + 2
+        self.blocked = frozenset((x, y) for y in range(height) for x in range(width) if not world.is_traversable(x, y))
+
+    def is_traversable(self, x: int, y: int) -> bool:
+        return (x, y) not in self.blocked
+
+
+_grid: WalkableGrid|None = None  # the grid in a worker process
+
+
+def _set_grid(grid: WalkableGrid):
+    global _grid
+    _grid = grid
+
+
+def solve_batch(requests: list[tuple[int, int, int, int]], grid: WalkableGrid|None = None) -> list[list[tuple[int, int]]|None]:
+    """Directions for every (start x, start y, goal x, goal y), or None where there's no path."""
+    grid = grid or _grid
+    results = []
+    for start_x, start_y, goal_x, goal_y in requests:
+        directions = get_directions(Vector2(start_x, start_y), Vector2(goal_x, goal_y), grid.is_traversable) # type: ignore
+        results.append(None if directions == -1 else [(direction.x, direction.y) for direction in directions])
+    return results
+
+
+class PathPlanner:
+    """Finds paths for characters off the main thread, in batches.
+
+    Requests made during a tick are deduplicated and sent to a worker process as one batch when the tick ends. At the
+    start of every tick the batches that have finished are resolved, for at most COLLECT_BUDGET seconds, and the game
+    never waits for the rest: characters hold on to their 'follow path' until their path has arrived.
+
+    How many ticks a path takes then depends on how busy the workers are, so while a session is being recorded every
+    batch is waited for on the next tick instead. That plays out exactly like workers=0, which solves each batch in the
+    game's thread, and is what replays do."""
+
+    COLLECT_BUDGET = 0.002  # seconds per tick spent resolving finished batches
+
+    def __init__(self, game: Game, workers: int = 1) -> None:
+        self.game = game
+        self.grid = WalkableGrid(game.world)
+        self.pool = ProcessPoolExecutor(workers, initializer=_set_grid, initargs=(self.grid,)) if workers else None
+
+        self.requests: dict[tuple[int, int, int, int], Future] = {}  # made this tick
+        self.in_flight: list[tuple[Future, list[Future]]] = []  # (batch, futures of its requests)
+
+        self.requested = 0
+        self.solved = 0
+
+    def request(self, start: Vector2, goal: Vector2) -> Future:
+        """A future of the directions from start to goal, or None if there's no path."""
+        self.requested += 1
+        key = (start.x, start.y, goal.x, goal.y)
+        if key not in self.requests:
+            self.requests[key] = Future()
+        return self.requests[key]
+
+    def submit(self):
+        """Called at the end of every tick, sends off the tick's requests."""
+        if not self.requests: return
+
+        keys, futures = list(self.requests), list(self.requests.values())
+        self.requests = {}
+        self.solved += len(keys)
+
+        if self.pool is None:
+            for future, directions in zip(futures, solve_batch(keys, self.grid)):
+                future.set_result(directions)
+        else:
+            self.in_flight.append((self.pool.submit(solve_batch, keys), futures))
+
+    def collect(self):
+        """Called at the start of every tick, resolves the futures of the batches that have finished, oldest first."""
+        if not self.in_flight: return
+
+        wait = self.game.recorder is not None
+        deadline = time.perf_counter() + self.COLLECT_BUDGET
+        resolved = 0
+        for batch, futures in self.in_flight:
+            if not wait and (not batch.done() or time.perf_counter() > deadline): break
+
+            for future, directions in zip(futures, batch.result()):
+                future.set_result(directions)
+            resolved += 1
+        del self.in_flight[:resolved]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
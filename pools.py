@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from character import Character
+from hair import Hair
+from mood import Mood
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+    from mood import MoodEngine
+    from vector import Vector2
+
+
+class ObjectPool:
+    """Objects that are no longer used, kept to be reset and reused instead of allocating new ones.
+
+    At most capacity objects are kept, anything released beyond that is left to the garbage collector."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.free: list = []
+
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def acquire(self):
+        """An object to reuse, or None if the pool is empty and a new one has to be made."""
+        if self.free:
+            self.hits += 1
+            return self.free.pop()
+
+        self.misses += 1
+        return None
+
+    def release(self, obj):
+        if len(self.free) < self.capacity:
+            self.free.append(obj)
+        else:
+            self.discarded += 1
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def __str__(self) -> str:
+        return f'{self.hit_rate:.0%} reused ({self.hits}/{self.hits+self.misses}), {len(self.free)} free'
+
+
+class CustomerPools:
+    """Pools for the characters, hair and moods of customers, refilled as customers leave the salon.
+
+    A customer's Hair holds 16 HairSections, so reusing it saves most of the allocations of a new customer."""
+
+    def __init__(self, capacity: int) -> None:
+        self.characters = ObjectPool(capacity)
+        self.hair = ObjectPool(capacity)
+        self.moods = ObjectPool(capacity)
+
+    def new_hair(self, starting_lengths: list[float]|None = None) -> Hair:
+        hair: Hair|None = self.hair.acquire()
+        if hair is None:
+            return Hair.new(starting_lengths)
+
+        hair.reset(starting_lengths)
+        return hair
+
+    def new_mood(self, engine: MoodEngine, mood: str = 'Happy') -> Mood:
+        reused: Mood|None = self.moods.acquire()
+        if reused is None:
+            return Mood.new(engine, mood)
+
+        reused.reset(mood)
+        return reused
+
+    def new_character(self, game: Game, name: str, age: int, hair: Hair, mood: Mood, position: Vector2,
+                      customer_id: int|None = None) -> Character:
+        character: Character|None = self.characters.acquire()
+        if character is None:
+            return Character(game, name, age, hair, mood, position, customer_id)
+
+        character.reset(name, age, hair, mood, position, customer_id)
+        return character
+
+    def release(self, character: Character):
+        """Called once a character has left and nothing refers to it any more."""
+        self.hair.release(character.hair)
+        self.moods.release(character.mood)
+        self.characters.release(character)
+
+    def __str__(self) -> str:
+        return f'characters {self.characters}, hair {self.hair}, moods {self.moods}'
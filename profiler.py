@@ -0,0 +1,168 @@
+from __future__ import annotations
+import cProfile
+import gc
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+
+
+class Profiler:
+    """Profiles a live session between two presses of the profiling key, without leaving curses.
+
+    In 'sampling' mode a background thread samples the main thread's stack every interval and the result is written as
+    collapsed stacks for flamegraph.pl or speedscope. In 'cprofile' mode cProfile traces the main thread and the result
+    is written as a pstats dump along with a text summary. Every file is named after the frames and game times it covers."""
+
+    MODES = ['sampling', 'cprofile']
+
+    def __init__(self, game: Game, mode: str = 'sampling', directory: str = '.', interval: float = 0.005) -> None:
+        if mode not in self.MODES: raise ValueError(f'Unknown profiler mode {mode}')
+
+        self.game = game
+        self.mode = mode
+        self.directory = directory
+        self.interval = interval
+
+        self.running = False
+        self.start_frame = 0
+        self.start_tick = 0
+
+        self.samples: dict[str, int] = {}
+        self.thread: threading.Thread|None = None
+        self.profile: cProfile.Profile|None = None
+
+    def toggle(self) -> str:
+        """Starts or stops profiling, returning a message for the chat."""
+        if not self.running:
+            self.start()
+            return f'[Profiler] {self.mode} profiling started'
+
+        paths = self.stop()
+        return f'[Profiler] Written to {", ".join(paths)}'
+
+    def start(self):
+        self.running = True
+        self.start_frame = self.game.frame_count
+        self.start_tick = self.game.current_tick
+
+        if self.mode == 'sampling':
+            self.samples = {}
+            self.thread = threading.Thread(target=self._sample, args=(threading.main_thread().ident,), daemon=True)
+            self.thread.start()
+
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self) -> list[str]:
+        """Stops profiling and writes the results, returning the paths written to."""
+        self.running = False
+
+        if self.mode == 'sampling':
+            self.thread.join() # type: ignore
+            return [self._write_collapsed()]
+
+        self.profile.disable() # type: ignore
+        return self._write_pstats()
+
+    def _sample(self, thread_id: int):
+        samples = self.samples
+        while self.running:
+            frame = sys._current_frames().get(thread_id)
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+
+            # Outermost frame first, as flame graphs expect
+            collapsed = ';'.join(reversed(stack))
+            samples[collapsed] = samples.get(collapsed, 0) + 1
+
+            time.sleep(self.interval)
+
+    def _annotation(self) -> tuple[str, str]:
+        """The name the files are written under and a description of the session profiled."""
+        game = self.game
+        start_time, end_time = game.gametime_at(self.start_tick), game.current_gametime
+        name = f'profile-frames{self.start_frame}-{game.frame_count}-ticks{self.start_tick}-{game.current_tick}'
+        description = (f'frames {self.start_frame}-{game.frame_count}, ticks {self.start_tick}-{game.current_tick}, '
+                       f'game time {start_time:%Y-%m-%d %H:%M}-{end_time:%H:%M}')
+        return os.path.join(self.directory, name), description
+
+    def _write_collapsed(self) -> str:
+        name, description = self._annotation()
+        path = name + '.collapsed'
+
+        with open(path, 'w') as f:
+            # The session is the root frame, so that the flame graph shows what it covers
+            for stack, count in sorted(self.samples.items()):
+                f.write(f'{description};{stack} {count}\n')
+
+        return path
+
+    def _write_pstats(self) -> list[str]:
+        name, description = self._annotation()
+        paths = [name + '.pstats', name + '.txt']
+
+        self.profile.dump_stats(paths[0]) # type: ignore
+
+        summary = io.StringIO()
+        pstats.Stats(self.profile, stream=summary).sort_stats('cumulative').print_stats(40)
+        with open(paths[1], 'w') as f:
+            f.write(f'# {description}\n')
+            f.write(summary.getvalue())
+
+        return paths
+
+
+class GCStats:
+    """Counts the garbage collections of every generation while it's running and how long they paused the game for.
+
+    Used to benchmark how much a headless run allocates: a gen 0 collection happens every time the number of tracked
+    objects allocated but not yet freed goes past gc.get_threshold()[0]."""
+
+    def __init__(self) -> None:
+        self.collections = [0, 0, 0]
+        self.pause_seconds = [0.0, 0.0, 0.0]
+        self.collected = 0
+        self.collection_start = 0.0
+
+        self.start_time = 0.0
+        self.elapsed = 0.0
+        self.start_blocks = 0
+        self.blocks = 0
+
+    def callback(self, phase: str, info: dict):
+        if phase == 'start':
+            self.collection_start = time.perf_counter()
+        else:
+            generation = info['generation']
+            self.collections[generation] += 1
+            self.pause_seconds[generation] += time.perf_counter() - self.collection_start
+            self.collected += info['collected']
+
+    def start(self):
+        gc.collect()
+        self.start_blocks = sys.getallocatedblocks()
+        self.start_time = time.perf_counter()
+        gc.callbacks.append(self.callback)
+
+    def stop(self):
+        gc.callbacks.remove(self.callback)
+        self.elapsed = time.perf_counter() - self.start_time
+        self.blocks = sys.getallocatedblocks() - self.start_blocks
+
+    def summary(self, ticks: int) -> str:
+        collections = ', '.join(f'gen {generation} {count} ({seconds*1000:.1f}ms)'
+                                for generation, (count, seconds) in enumerate(zip(self.collections, self.pause_seconds)))
+        return (f'[GC] {collections}; {sum(self.collections)*1000/max(ticks, 1):.2f} collections per 1000 ticks, '
+                f'{self.collected} objects collected, {self.blocks:+} blocks held')
@@ -0,0 +1,295 @@
+from __future__ import annotations
+from functools import lru_cache
+
+from hair import Hair, HairSection, SECTION_INDICES
+from events import ServiceDone, Said
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from character import Character
+
+
+class ServiceCommand:
+    """A single thing that can be done to a customer in the haircutting chair.
+
+    Commands are created once with their parameters already resolved and are then reused for every customer.
+    describe() is called before apply() since toggling commands describe the state they change.
+    Commands that need a section are described with the name of the region(s) they're done to."""
+
+    name = ''
+    needs_section = False
+
+    def describe(self, character: Character, region: str = '') -> str:
+        raise NotImplementedError()
+
+    def apply(self, character: Character, section: HairSection|None = None):
+        raise NotImplementedError()
+
+    def apply_many(self, character: Character, sections: list[HairSection]):
+        for section in sections:
+            self.apply(character, section)
+
+
+def record_service(character: Character, command: ServiceCommand, sections: list[HairSection]|None = None):
+    """Emits a service done, for the ledger."""
+    events = character.game.events
+    if not events.wants(ServiceDone): return
+
+    indices = None if sections is None else [SECTION_INDICES[section.region_name] for section in sections]
+    events.emit(ServiceDone, character.customer_id, command, indices, character.chair)
+
+
+def describe_regions(sections: list[HairSection]) -> str:
+    """eg. 'left top, right top and left crown', or 'whole head' when every section is included."""
+    if len(sections) == len(Hair.REGION_NAMES):
+        return 'whole head'
+
+    region_names = [section.region_name for section in sections]
+    if len(region_names) == 1:
+        return region_names[0]
+
+    return f'{", ".join(region_names[:-1])} and {region_names[-1]}'
+
+
+class Wash(ServiceCommand):
+    name = 'wash'
+
+    def describe(self, character, region=''):
+        return f'You wash {character.name}\'s hair under a sink.'
+
+    def apply(self, character, section=None):
+        character.hair.on_wash()
+
+
+class NeckRoll(ServiceCommand):
+    name = 'neck roll'
+
+    def describe(self, character, region=''):
+        if character.has_neck_roll:
+            return f'You remove the neckroll from {character.name}\'s neck.'
+        return f'You wrap a neck roll around {character.name}\'s neck.'
+
+    def apply(self, character, section=None):
+        character.has_neck_roll = not character.has_neck_roll
+
+
+class Cape(ServiceCommand):
+    name = 'cape'
+
+    def describe(self, character, region=''):
+        if character.has_cape:
+            return f'You uncape {character.name}.'
+        return f'You cover {character.name}\'s with a cape.'
+
+    def apply(self, character, section=None):
+        character.has_cape = not character.has_cape
+
+
+class Brush(ServiceCommand):
+    name = 'brush'
+
+    def describe(self, character, region=''):
+        return f'You brush out {character.name}\'s hair.'
+
+    def apply(self, character, section=None):
+        pass
+
+
+class Clean(ServiceCommand):
+    name = 'clean'
+
+    def describe(self, character, region=''):
+        if character.has_cape:
+            return f'You clean up {character.name}\'s cape of cut hair.'
+        return f'You clean up {character.name}\'s dress of cut hair.'
+
+    def apply(self, character, section=None):
+        pass
+
+
+class BlowDry(ServiceCommand):
+    name = 'blow dry'
+
+    def describe(self, character, region=''):
+        return f'You blow dry {character.name}\'s hair.'
+
+    def apply(self, character, section=None):
+        character.hair.on_blow_dry()
+
+
+class Free(ServiceCommand):
+    name = 'free'
+
+    def describe(self, character, region=''):
+        if character.has_cape and character.has_neck_roll:
+            return f'You uncape {character.name} and also remove the neckroll from her neck.'
+        elif character.has_cape:
+            return f'You uncape {character.name}.'
+        elif character.has_neck_roll:
+            return f'You remove the neckroll from {character.name}\'s neck.'
+        return f'{character.name} is not caped nor does she have a neck roll on.'
+
+    def apply(self, character, section=None):
+        character.has_cape = False
+        character.has_neck_roll = False
+
+
+class SendOff(ServiceCommand):
+    name = 'send off'
+
+    def describe(self, character, region=''):
+        if character.has_cape and character.has_neck_roll:
+            return f'Remove the cape and neck roll from {character.name} before you send her off.'
+        elif character.has_cape:
+            return f'Remove the cape from {character.name} before you send her off.'
+        elif character.has_neck_roll:
+            return f'Remove the neck roll from {character.name} before you send her off.'
+        return f'{character.name} gets up from the chair.'
+
+    def apply(self, character, section=None):
+        if not character.has_cape and not character.has_neck_roll:
+            character.on_haircut_finished()
+            character.add_action('plan', 'walk out')
+
+
+class Spray(ServiceCommand):
+    name = 'spray'
+    needs_section = True
+
+    def describe(self, character, region=''):
+        return f'You wet {character.name}\'s {region}.'
+
+    def apply(self, character, section=None):
+        if character.hair.strands is not None:
+            return character.hair.strands.spray([SECTION_INDICES[section.region_name]])
+        section._wetness += 0.5
+
+    def apply_many(self, character, sections):
+        if character.hair.strands is not None:
+            return character.hair.strands.spray([SECTION_INDICES[section.region_name] for section in sections])
+        super().apply_many(character, sections)
+
+
+# How the ends of a cut are shaped, only the strand level hair in strands.py can tell them apart
+CUT_PROFILES = ['blunt', 'point cut', 'taper']
+
+
+class Scissors(ServiceCommand):
+    name = 'scissors'
+    needs_section = True
+
+    def __init__(self, length_cut: int, profile: str = 'blunt') -> None:
+        if profile not in CUT_PROFILES: raise ValueError(f'Unknown cut profile {profile}')
+        self.length_cut = length_cut  # inches
+        self.profile = profile
+
+    def describe(self, character, region=''):
+        verb = {'blunt': 'cut', 'point cut': 'point cut', 'taper': 'taper cut'}[self.profile]
+        return f'You {verb} {self.length_cut} inches of {character.name}\'s hair from her {region}.'
+
+    def apply(self, character, section=None):
+        if character.hair.strands is not None:
+            return self.apply_many(character, [section])
+        section._length = max(section._length-self.length_cut, 1)
+
+    def apply_many(self, character, sections):
+        if character.hair.strands is not None:
+            return character.hair.strands.scissors([SECTION_INDICES[section.region_name] for section in sections],
+                                                   self.length_cut, self.profile)
+        super().apply_many(character, sections)
+
+
+class Clippers(ServiceCommand):
+    name = 'clippers'
+    needs_section = True
+
+    def __init__(self, guard: int, profile: str = 'blunt') -> None:
+        if profile not in CUT_PROFILES: raise ValueError(f'Unknown cut profile {profile}')
+        self.guard = guard  # 0 is guardless
+        self.length_remaining = guard/8  # inches
+        self.profile = profile
+
+    def describe(self, character, region=''):
+        if self.guard == 0:
+            return f'You plough the guardless clippers over {character.name}\'s {region}, revealing her bare scalp.'
+        if self.profile == 'taper':
+            return f'You taper {character.name}\'s {region} down to a {self.length_remaining} inch stubble.'
+        return f'You plough through {character.name}\'s {region}, leaving behind a {self.length_remaining} inch stubble.'
+
+    def apply(self, character, section=None):
+        if character.hair.strands is not None:
+            return self.apply_many(character, [section])
+        section._length = 0 if self.guard == 0 else self.length_remaining
+
+    def apply_many(self, character, sections):
+        if character.hair.strands is not None:
+            return character.hair.strands.clippers([SECTION_INDICES[section.region_name] for section in sections],
+                                                   self.length_remaining, self.profile)
+        super().apply_many(character, sections)
+
+
+class Razor(ServiceCommand):
+    name = 'razor'
+    needs_section = True
+
+    def describe(self, character, region=''):
+        return ''
+
+    def apply(self, character, section=None):
+        pass
+
+
+COMMAND_TYPES: dict[str, type[ServiceCommand]] = {command_type.name: command_type for command_type in [
+    Wash, NeckRoll, Cape, Brush, Clean, BlowDry, Free, SendOff, Spray, Scissors, Clippers, Razor
+]}
+
+
+@lru_cache(maxsize=None)
+def get_command(name: str, *params) -> ServiceCommand:
+    """Returns the shared command for a name and its parameters, eg. get_command('scissors', 4)."""
+    if name not in COMMAND_TYPES: raise KeyError(f'Unknown service {name}')
+    return COMMAND_TYPES[name](*params)
+
+
+class Recipe:
+    """A sequence of services compiled once and applied to any number of customers in one call.
+
+    Steps are tuples of a service name, its parameters and optionally the regions it's done to, eg.
+        Recipe([('wash',), ('cape',), ('clippers', 2, 'left nape', 'right nape'), ('scissors', 4, 'taper', 'left top')])
+    Cutting services with no regions are done to every section of hair. A cut profile (see CUT_PROFILES) can follow the
+    scissors' or clippers' setting."""
+
+    def __init__(self, steps: list[tuple]) -> None:
+        self.steps: list[tuple[ServiceCommand, list[int]|None]] = []
+
+        for name, *rest in steps:
+            params = [param for param in rest if not isinstance(param, str) or param in CUT_PROFILES]
+            region_names = [param for param in rest if isinstance(param, str) and param not in CUT_PROFILES]
+
+            command = get_command(name, *params)
+            if command.needs_section:
+                indices = [Hair.REGION_NAMES.index(region_name) for region_name in region_names] or list(range(len(Hair.REGION_NAMES)))
+                self.steps.append((command, indices))
+            else:
+                self.steps.append((command, None))
+
+    def apply(self, characters: list[Character]):
+        """Does every step to every character, describing each step in the chat if anything listens for it."""
+        for character in characters:
+            sections = character.hair.sections
+            events = character.events
+
+            for command, indices in self.steps:
+                if indices is None:
+                    if events.wants(Said):
+                        events.emit(Said, command.describe(character))
+                    command.apply(character)
+                    record_service(character, command)
+                else:
+                    step_sections = [sections[index] for index in indices]
+                    if events.wants(Said):
+                        events.emit(Said, command.describe(character, describe_regions(step_sections)))
+                    command.apply_many(character, step_sections)
+                    record_service(character, command, step_sections)
+
+            character.hair.evaluate_description()
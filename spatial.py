@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+
+class SpatialHash:
+    """A uniform grid over the salon floor for finding what's near a position without looking at everything.
+
+    Every object is kept in the cell its position falls in, and moving an object only touches the hash when it crosses
+    into another cell. A query only looks at the cells its radius overlaps, so it costs the same however many objects
+    there are elsewhere. Distances are in steps, like the player and customers move: a step sideways is x_step columns
+    and a step up or down is one row, diagonals count as one step."""
+
+    def __init__(self, cell_size: int = 2, x_step: int = 2) -> None:
+        self.cell_size = cell_size  # in steps
+        self.x_step = x_step
+
+        # Cells hold dicts rather than sets so that queries return objects in a reproducible order
+        self.cells: dict[tuple[int, int], dict[object, None]] = {}
+        self.positions: dict[object, tuple[int, int, tuple[int, int]]] = {}  # x, y and cell of every object
+
+    def cell_of(self, x: int, y: int) -> tuple[int, int]:
+        return (x // (self.cell_size*self.x_step), y // self.cell_size)
+
+    def insert(self, obj, x: int, y: int):
+        cell = self.cell_of(x, y)
+        self.cells.setdefault(cell, {})[obj] = None
+        self.positions[obj] = (x, y, cell)
+
+    def move(self, obj, x: int, y: int):
+        _, _, old_cell = self.positions[obj]
+        cell = self.cell_of(x, y)
+        if cell != old_cell:
+            self._leave(obj, old_cell)
+            self.cells.setdefault(cell, {})[obj] = None
+        self.positions[obj] = (x, y, cell)
+
+    def remove(self, obj):
+        _, _, cell = self.positions.pop(obj)
+        self._leave(obj, cell)
+
+    def _leave(self, obj, cell: tuple[int, int]):
+        occupants = self.cells[cell]
+        del occupants[obj]
+        if not occupants:
+            del self.cells[cell]
+
+    def query(self, x: int, y: int, radius: int) -> list:
+        """Everything within radius steps of a position."""
+        left, right, top, bottom = x - radius*self.x_step, x + radius*self.x_step, y - radius, y + radius
+        cell_width, cell_height = self.cell_size*self.x_step, self.cell_size
+
+        found = []
+        cells, positions = self.cells, self.positions
+        for cell_x in range(left // cell_width, right // cell_width + 1):
+            for cell_y in range(top // cell_height, bottom // cell_height + 1):
+                occupants = cells.get((cell_x, cell_y))
+                if occupants is None: continue
+
+                for obj in occupants:
+                    obj_x, obj_y, _ = positions[obj]
+                    if left <= obj_x <= right and top <= obj_y <= bottom:
+                        found.append(obj)
+        return found
+
+    def neighbours(self, obj, radius: int) -> list:
+        """Everything else within radius steps of an object."""
+        x, y, _ = self.positions[obj]
+        return [other for other in self.query(x, y, radius) if other is not obj]
+
+    def __contains__(self, obj) -> bool:
+        return obj in self.positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
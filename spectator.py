@@ -0,0 +1,239 @@
+from __future__ import annotations
+import asyncio
+import curses
+import json
+import os
+import socket
+import struct
+import threading
+import zlib
+from math import ceil, floor
+
+from windows import MAIN_WINDOW_HEIGHT, MAIN_WINDOW_WIDTH, CHAT_WINDOW_WIDTH
+
+
+# Every message is a 4 byte length followed by zlib compressed JSON, either
+#   {"type": "key", "frame": n, "panels": {panel: [line, ...]}}
+# or, for the frames after it,
+#   {"type": "diff", "sizes": {panel: number of lines}, "changes": [[panel, line number, line], ...]}
+LENGTH = struct.Struct('>I')
+
+PANELS = ['world', 'chat', 'controls']
+
+
+def parse_address(address: str):
+    """'unix:/path/to.sock' for a unix socket, otherwise 'host:port'."""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or 'localhost', int(port))
+
+
+def encode(message: dict) -> bytes:
+    payload = zlib.compress(json.dumps(message, separators=(',', ':')).encode())
+    return LENGTH.pack(len(payload)) + payload
+
+
+class SpectatorServer:
+    """Streams the game's panels to any number of terminal clients.
+
+    The diff between frames is computed and compressed once in the game's thread, and the same bytes are sent to every
+    client by an asyncio loop running in a background thread, so the game doesn't slow down as viewers join.
+    Clients that fall behind skip frames and are sent a keyframe once they've caught up.
+
+    Each thread keeps its own state: the game's thread only touches previous and published, and every frame is handed
+    to the loop with call_soon_threadsafe, which alone touches frame, latest and keyframe."""
+
+    HIGH_WATER = 64*1024  # bytes queued for a client before its frames are dropped
+
+    def __init__(self, address: str) -> None:
+        self.kind, self.address = parse_address(address)
+
+        self.clients: set[asyncio.StreamWriter] = set()
+        self.needs_keyframe: set[asyncio.StreamWriter] = set()
+
+        # The game's thread's
+        self.previous: dict[str, list[str]] = {}
+        self.published = 0  # frames handed to the loop
+
+        # The loop's
+        self.frame = 0
+        self.latest: dict[str, list[str]] = {}
+        self.keyframe: tuple[int, bytes]|None = None
+
+        self.dropped_frames = 0
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.server: asyncio.AbstractServer|None = None
+
+    def start(self):
+        started = threading.Event()
+        self.loop.call_soon(started.set)
+        self.thread.start()
+        started.wait()
+
+    STOP_TIMEOUT = 2  # seconds to wait for clients to be hung up on
+
+    def stop(self):
+        """Hangs up on every client, closes the server and waits for the loop's thread to finish."""
+        if self.thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(self.STOP_TIMEOUT)
+            except TimeoutError:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+        # A unix socket's file outlives the server, and would stop the next server listening on the same path
+        if self.kind == 'unix' and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    async def _close(self):
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.clients):
+            writer.close()
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        if self.kind == 'unix':
+            server = asyncio.start_unix_server(self._on_connect, self.address)
+        else:
+            server = asyncio.start_server(self._on_connect, *self.address)
+
+        self.server = self.loop.run_until_complete(server)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients.add(writer)
+        if self.latest:
+            writer.write(self._get_keyframe())
+        else:
+            self.needs_keyframe.add(writer)
+
+        try:
+            # Clients don't send anything, this just waits for them to hang up
+            await reader.read()
+        finally:
+            self.clients.discard(writer)
+            self.needs_keyframe.discard(writer)
+            writer.close()
+
+    def _get_keyframe(self) -> bytes:
+        # Only built when a client needs one, and then shared by every client that needs it this frame
+        if self.keyframe is None or self.keyframe[0] != self.frame:
+            self.keyframe = (self.frame, encode({'type': 'key', 'frame': self.frame, 'panels': self.latest}))
+        return self.keyframe[1]
+
+    def publish(self, panels: dict[str, list[str]]):
+        """Called from the game's thread once per rendered frame, only while there are clients to save building panels."""
+        changes = []
+        for panel, lines in panels.items():
+            previous = self.previous.get(panel, [])
+            for i, line in enumerate(lines):
+                if i >= len(previous) or previous[i] != line:
+                    changes.append([panel, i, line])
+
+        self.previous = panels
+        if not changes and self.published:
+            return
+        self.published += 1
+
+        message = encode({'type': 'diff', 'sizes': {panel: len(lines) for panel, lines in panels.items()},
+                          'changes': changes})
+        self.loop.call_soon_threadsafe(self._broadcast, panels, message)
+
+    def _broadcast(self, panels: dict[str, list[str]], message: bytes):
+        self.frame += 1
+        self.latest = panels
+
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > self.HIGH_WATER:
+                self.needs_keyframe.add(writer)
+                self.dropped_frames += 1
+
+            elif writer in self.needs_keyframe:
+                writer.write(self._get_keyframe())
+                self.needs_keyframe.discard(writer)
+
+            else:
+                writer.write(message)
+
+
+def connect(address: str) -> socket.socket:
+    kind, address = parse_address(address)
+    sock = socket.socket(socket.AF_UNIX if kind == 'unix' else socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+def run_client(stdscr: curses.window, address: str):
+    curses.curs_set(0)
+    stdscr.nodelay(True)
+
+    windows = {
+        'world': curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 0, 0),
+        'controls': curses.newwin(curses.LINES-ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH),
+                                  ceil(curses.LINES*MAIN_WINDOW_HEIGHT), 0),
+        'chat': curses.newwin(curses.LINES, floor(curses.COLS*CHAT_WINDOW_WIDTH), 0, ceil(curses.COLS*MAIN_WINDOW_WIDTH)),
+    }
+    panels: dict[str, list[str]] = {panel: [] for panel in PANELS}
+
+    sock = connect(address)
+    sock.settimeout(0.05)
+
+    buffer = b''
+    while stdscr.getch() != ord('q'):
+        try:
+            data = sock.recv(1 << 16)
+        except socket.timeout:
+            continue
+
+        if not data: break
+        buffer += data
+
+        changed = set()
+        while len(buffer) >= LENGTH.size:
+            length, = LENGTH.unpack_from(buffer)
+            if len(buffer) < LENGTH.size + length: break
+
+            message = json.loads(zlib.decompress(buffer[LENGTH.size:LENGTH.size+length]))
+            buffer = buffer[LENGTH.size+length:]
+
+            if message['type'] == 'key':
+                panels.update(message['panels'])
+                changed.update(PANELS)
+
+            else:
+                for panel, size in message['sizes'].items():
+                    panels[panel] = (panels[panel] + [''] * size)[:size]
+                for panel, i, line in message['changes']:
+                    panels[panel][i] = line
+                    changed.add(panel)
+
+        for panel in changed:
+            window = windows[panel]
+            window.erase()
+            window.border()
+            window.addstr(0, 1, panel.capitalize())
+
+            height, width = window.getmaxyx()
+            for i, line in enumerate(panels[panel][:height-2]):
+                try:
+                    window.addstr(1+i, 1, line[:width-2])
+                except curses.error:
+                    pass
+
+            window.refresh()
+
+
+if __name__ == '__main__':
+    import sys
+    curses.wrapper(run_client, sys.argv[1] if len(sys.argv) > 1 else 'localhost:8765')
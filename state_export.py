@@ -0,0 +1,167 @@
+from __future__ import annotations
+import datetime
+import mmap
+import struct
+import time
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+
+
+# The state block is a fixed layout file that's rewritten in place once per tick:
+#   header: magic, version, capacity, sequence number, tick, gametime (seconds since the epoch),
+#           player x and y, number of waiting and haircutting chairs
+#   the entity id sitting in every waiting chair, then every haircutting chair (-1 if empty), MAX_CHAIRS each
+#   one column per entity field (alive, x, y, state, chair), capacity entries each, indexed by entity id
+# The sequence number is odd while the block is being written, so readers can tell a torn read from a consistent one.
+MAGIC = b'HSSX'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHHQqqhhHH')
+SEQUENCE_OFFSET = 8
+SEQUENCE = struct.Struct('<Q')
+MAX_CHAIRS = 32
+CHAIRS = struct.Struct(f'<{2*MAX_CHAIRS}h')
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+STATES = ['arriving', 'waiting', 'being served', 'leaving']
+
+
+def _column_offsets(capacity: int) -> dict[str, int]:
+    offsets = {}
+    offset = HEADER.size + CHAIRS.size
+    for name, itemsize in (('alive', 1), ('x', 2), ('y', 2), ('state', 1), ('chair', 2)):
+        offsets[name] = offset
+        offset += itemsize*capacity
+    offsets['end'] = offset
+    return offsets
+
+
+class StatePublisher:
+    """Writes the live state of a game into a memory mapped file for dashboards to read.
+
+    Entity columns are copied straight out of the EntityStore's arrays, so publishing costs a few memcpys."""
+
+    def __init__(self, game: Game, path: str, capacity: int = 4096) -> None:
+        if len(game.world.WAITING_CHAIRS) > MAX_CHAIRS or len(game.world.HAIRCUTTING_CHAIRS) > MAX_CHAIRS:
+            raise ValueError(f'Only {MAX_CHAIRS} chairs of each kind can be exported')
+
+        self.game = game
+        self.capacity = capacity
+        self.offsets = _column_offsets(capacity)
+
+        with open(path, 'wb') as f:
+            f.truncate(self.offsets['end'])
+
+        self.file = open(path, 'r+b')
+        self.buffer = mmap.mmap(self.file.fileno(), self.offsets['end'])
+        self.sequence = 0
+
+    def publish(self):
+        game = self.game
+        entities = game.entities
+        count = min(len(entities.characters), self.capacity)
+
+        self.sequence += 1
+        SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, self.sequence)
+
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, self.capacity, self.sequence, game.current_tick,
+                         int((game.current_gametime - EPOCH).total_seconds()), *game.player.position,
+                         len(game.world.waiting_chairs), len(game.world.haircutting_chairs))
+
+        chairs = [-1] * (2*MAX_CHAIRS)
+        for i, occupant in enumerate(game.world.waiting_chairs.values()):
+            if occupant is not None: chairs[i] = occupant.id
+        for i, occupant in enumerate(game.world.haircutting_chairs.values()):
+            if occupant is not None: chairs[MAX_CHAIRS+i] = occupant.id
+        CHAIRS.pack_into(self.buffer, HEADER.size, *chairs)
+
+        for name in ('alive', 'x', 'y', 'state', 'chair'):
+            column = getattr(entities, name)
+            start = self.offsets[name]
+            data = memoryview(column)[:count].cast('B')
+            self.buffer[start:start+len(data)] = data
+
+        # Rows past the end of the store are marked dead so that readers ignore stale entities
+        alive_end = self.offsets['alive'] + self.capacity
+        self.buffer[self.offsets['alive']+count:alive_end] = bytes(self.capacity-count)
+
+        self.sequence += 1
+        SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, self.sequence)
+
+    def close(self):
+        """Publishes the state the game ended in and writes it out, so readers opening the file later see it."""
+        self.publish()
+        self.buffer.flush()
+        self.buffer.close()
+        self.file.close()
+
+
+class StateReader:
+    """Reads consistent snapshots of a game's state published by a StatePublisher, from any process."""
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, capacity, *_ = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} state export')
+
+        self.capacity = capacity
+        self.offsets = _column_offsets(capacity)
+
+    def read_raw(self, retries: int = 1000) -> bytes:
+        """A copy of the whole block that wasn't being written to while it was copied."""
+        for _ in range(retries):
+            before, = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)
+            if before % 2 == 0:
+                data = self.buffer[:]
+                after, = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)
+                if before == after:
+                    return data
+            time.sleep(0)
+
+        raise TimeoutError('The state block kept changing while it was read')
+
+    def snapshot(self) -> dict:
+        data = self.read_raw()
+        _, _, _, sequence, tick, gametime, player_x, player_y, waiting_count, haircutting_count = HEADER.unpack_from(data)
+        chairs = CHAIRS.unpack_from(data, HEADER.size)
+
+        def column(name, typecode):
+            start = self.offsets[name]
+            return memoryview(data)[start:start+self.capacity*struct.calcsize(typecode)].cast(typecode)
+
+        alive, xs, ys, states, chair_ids = column('alive', 'B'), column('x', 'h'), column('y', 'h'), column('state', 'B'), column('chair', 'h')
+        characters = [{'id': i, 'position': (xs[i], ys[i]), 'state': STATES[states[i]], 'chair': chair_ids[i]}
+                      for i in range(self.capacity) if alive[i]]
+
+        return {
+            'sequence': sequence,
+            'tick': tick,
+            'gametime': EPOCH + datetime.timedelta(seconds=gametime),
+            'player': (player_x, player_y),
+            'waiting_chairs': list(chairs[:waiting_count]),
+            'haircutting_chairs': list(chairs[MAX_CHAIRS:MAX_CHAIRS+haircutting_count]),
+            'queue_length': sum(1 for character in characters if character['state'] == 'waiting'),
+            'characters': characters,
+        }
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    reader = StateReader(sys.argv[1])
+    while True:
+        snapshot = reader.snapshot()
+        occupied = sum(occupant != -1 for occupant in snapshot['haircutting_chairs'])
+        print(f'{snapshot["gametime"]}  tick {snapshot["tick"]}  {len(snapshot["characters"])} customers  '
+              f'{snapshot["queue_length"]} waiting  {occupied}/{len(snapshot["haircutting_chairs"])} haircutting chairs in use')
+        time.sleep(1)
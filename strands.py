@@ -0,0 +1,129 @@
+from __future__ import annotations
+import numpy as np
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from hair import Hair
+
+
+def passes(indices: list[int]) -> list[list[int]]:
+    """Splits section indices into passes that list each section at most once.
+
+    Fancy indexing only applies an op once to a row that's listed twice, where HairSections would have it done
+    twice, so a section's second listing goes into a second pass, its third into a third and so on."""
+    if len(set(indices)) == len(indices):
+        return [indices]
+
+    split: list[list[int]] = []
+    seen: dict[int, int] = {}
+    for i in indices:
+        n = seen.get(i, 0)
+        seen[i] = n + 1
+        if n == len(split): split.append([])
+        split[n].append(i)
+    return split
+
+
+class StrandHair:
+    """Individual strands for every section of a Hair, kept in (section, strand) arrays so every tool is one numpy op.
+
+    The sections' _length, _health and _wetness become summaries of their strands, refreshed only for the sections
+    an operation touched, so the rest of the game keeps working on sections.
+
+    Cut profiles:
+        blunt: every strand longer than the cut line is cut to it
+        point cut: the line is broken up, ends are left up to a tenth of the cut longer
+        taper: the line slopes across the section, a fifth of the cut shorter at one edge and longer at the other"""
+
+    GROWTH_PER_DAY = 0.1  # inches per day at full health, as HairSection
+
+    def __init__(self, hair: Hair, strands_per_section: int = 1000, seed: int = 0) -> None:
+        self.hair = hair
+        self.all_sections = list(range(len(hair.sections)))
+
+        shape = (len(hair.sections), strands_per_section)
+        self.lengths = np.empty(shape, dtype=np.float32)
+        self.health = np.empty(shape, dtype=np.float32)
+        self.wetness = np.empty(shape, dtype=np.float32)
+
+        # Where each strand sits across its section, from 0 at one edge to 1 at the other, for tapering
+        self.across = np.linspace(0, 1, strands_per_section, dtype=np.float32)
+
+        self.reset(seed)
+
+    def reset(self, seed: int):
+        """Fills every strand from its section, in place, for new hair and hair reused from a pool."""
+        self.rng = np.random.default_rng(seed)
+        sections = self.hair.sections
+
+        # Natural hair isn't all the same length, strands vary by a couple of percent around the section's length
+        np.multiply(np.array([section._length for section in sections], dtype=np.float32)[:, None],
+                    self.rng.uniform(0.98, 1.02, self.lengths.shape).astype(np.float32), out=self.lengths)
+        self.health[:] = np.array([section._health for section in sections], dtype=np.float32)[:, None]
+        self.wetness[:] = np.array([section._wetness for section in sections], dtype=np.float32)[:, None]
+
+        self.summarise(self.all_sections)
+
+    def rows(self, indices: list[int]) -> slice|list[int]:
+        """What to index the arrays with, a whole head is a slice so that it's a view instead of a copy."""
+        return slice(None) if indices == self.all_sections else indices
+
+    def summarise(self, indices: list[int], lengths: bool = True, health: bool = True, wetness: bool = True):
+        """Refreshes the summaries an operation changed, for the sections it touched."""
+        rows = self.rows(indices)
+        for changed, array, attribute in ((lengths, self.lengths, '_length'), (health, self.health, '_health'),
+                                          (wetness, self.wetness, '_wetness')):
+            if not changed: continue
+            for i, mean in zip(indices, array[rows].mean(axis=1).tolist()):
+                setattr(self.hair.sections[i], attribute, mean)
+
+    def _cut_to(self, indices: list[int], line: np.ndarray, depth: float, profile: str):
+        """Cuts the strands of the sections at indices to a line per section, shaped by the profile."""
+        line = line[:, None]
+        if profile == 'point cut':
+            line = line + self.rng.random((len(indices), self.lengths.shape[1]), dtype=np.float32) * np.float32(0.1*depth)
+        elif profile == 'taper':
+            line = line + (self.across - 0.5) * np.float32(0.4*depth)
+        elif profile != 'blunt':
+            raise ValueError(f'Unknown cut profile {profile}')
+        np.maximum(line, 0, out=line)
+
+        rows = self.rows(indices)
+        if isinstance(rows, slice):
+            np.minimum(self.lengths, line, out=self.lengths)
+        else:
+            self.lengths[rows] = np.minimum(self.lengths[rows], line)
+        self.summarise(indices, health=False, wetness=False)
+
+    def scissors(self, indices: list[int], length_cut: float, profile: str = 'blunt'):
+        """Takes length_cut inches off the sections, but never below an inch, like Scissors does to a section."""
+        for indices in passes(indices):
+            line = np.array([self.hair.sections[i]._length for i in indices], dtype=np.float32) - np.float32(length_cut)
+            self._cut_to(indices, np.maximum(line, 1), length_cut, profile)
+
+    def clippers(self, indices: list[int], length_remaining: float, profile: str = 'blunt'):
+        """Clips the sections down to length_remaining inches, a taper blending them into longer hair like a fade."""
+        for indices in passes(indices):
+            line = np.full(len(indices), length_remaining, dtype=np.float32)
+            self._cut_to(indices, line, max(length_remaining, 0.125), profile)
+
+    def spray(self, indices: list[int], amount: float = 0.5):
+        for indices in passes(indices):
+            self.wetness[self.rows(indices)] += amount
+            self.summarise(indices, lengths=False, health=False)
+
+    def wash(self):
+        self.wetness.fill(1)
+        self.summarise(self.all_sections, lengths=False, health=False)
+
+    def blow_dry(self):
+        self.wetness.fill(0)
+        self.summarise(self.all_sections, lengths=False, health=False)
+
+    def grow(self, days_passed: float):
+        self.lengths += self.health * np.float32(self.GROWTH_PER_DAY * days_passed)
+        self.summarise(self.all_sections, health=False, wetness=False)
+
+    def unevenness(self) -> list[float]:
+        """The standard deviation of strand lengths in every section, in inches."""
+        return self.lengths.std(axis=1).tolist()
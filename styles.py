@@ -0,0 +1,107 @@
+from __future__ import annotations
+import heapq
+import math
+from operator import sub
+from functools import lru_cache
+
+from hair import Hair
+
+try:
+    import numpy as np
+except ImportError:  # Queries fall back to a brute force search in plain Python
+    np = None
+
+
+def _style(bangs: float, sides: float, top: float, back: float, nape: float) -> list[float]:
+    """A style's length for every region, in the order of Hair.REGION_NAMES."""
+    return [bangs, bangs, sides, sides, top, top, sides, sides, top, top, sides, sides, back, back, nape, nape]
+
+
+BASE_STYLES = {
+    'Bald': _style(0, 0, 0, 0, 0),
+    'Buzz cut': _style(0.25, 0.25, 0.25, 0.25, 0.25),
+    'Crew cut': _style(1, 0.5, 1.5, 0.5, 0.25),
+    'Undercut': _style(6, 0.25, 6, 0.25, 0.125),
+    'Pixie': _style(2, 1, 2.5, 1.5, 1),
+    'Bowl cut': _style(2.5, 3, 4, 3, 1),
+    'Mullet': _style(2, 1, 2, 8, 12),
+    'Shag': _style(3, 8, 5, 10, 10),
+    'Bob': _style(8, 9, 10, 9, 8),
+    'Lob': _style(10, 12, 13, 12, 11),
+    'Shoulder length layers': _style(8, 12, 10, 13, 13),
+    'Long layers': _style(10, 18, 14, 20, 20),
+    'Grown out': _style(20, 20, 20, 20, 20),
+    'Waist length': _style(24, 24, 24, 24, 24),
+}
+
+FRINGES = {'': None, 'micro fringe': 0.5, 'eyebrow fringe': 2, 'curtain bangs': 4}
+SCALES = {'shorter': 0.8, '': 1, 'longer': 1.25}
+
+
+def catalogue_styles() -> dict[str, list[float]]:
+    """Every base style with every fringe, a bit shorter and a bit longer."""
+    styles = {}
+    for base, lengths in BASE_STYLES.items():
+        for fringe, fringe_length in FRINGES.items():
+            for scale, factor in SCALES.items():
+                styles[base + (f' with {fringe}' if fringe else '') + (f', {scale}' if scale else '')] = [
+                    fringe_length if fringe_length is not None and i < 2 else length*factor
+                    for i, length in enumerate(lengths)]
+    return styles
+
+
+class StyleCatalogue:
+    """Named styles, each a length for every hair region, indexed for finding the styles closest to a head of hair.
+
+    Distances are reported as the root mean square difference in inches over the regions, ie. how many inches off a
+    typical region is."""
+
+    def __init__(self, styles: dict[str, list[float]]) -> None:
+        self.names = list(styles)
+        self.lengths = list(styles.values())
+        self.regions = len(Hair.REGION_NAMES)
+
+        if np is not None:
+            self.matrix = np.array(self.lengths, dtype=np.float64)
+            self.squared_norms = (self.matrix*self.matrix).sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _inches_off(self, squared_distance: float) -> float:
+        return math.sqrt(max(squared_distance, 0) / self.regions)
+
+    def closest(self, lengths: list[float], k: int = 1) -> list[tuple[str, float]]:
+        """The k styles closest to a list of region lengths, as (name, inches off), closest first."""
+        return self.closest_many([lengths], k)[0]
+
+    def closest_many(self, queries: list[list[float]], k: int = 1) -> list[list[tuple[str, float]]]:
+        """closest() for a whole population of heads at once."""
+        if np is None:
+            # A KD-tree barely prunes anything in 16 dimensions, so checking every style is just as fast
+            results = []
+            for query in queries:
+                distances = ((sum(d*d for d in map(sub, query, lengths)), i) for i, lengths in enumerate(self.lengths))
+                results.append([(self.names[i], self._inches_off(distance)) for distance, i in heapq.nsmallest(k, distances)])
+            return results
+
+        queries_matrix = np.asarray(queries, dtype=np.float64)
+        # |q - s|^2 = |q|^2 + |s|^2 - 2 q.s, for every query and style in one matrix product
+        distances = ((queries_matrix*queries_matrix).sum(axis=1)[:, None] + self.squared_norms[None, :]
+                     - 2*queries_matrix @ self.matrix.T)
+
+        k = min(k, len(self))
+        nearest = np.argpartition(distances, k-1, axis=1)[:, :k] if k < len(self) else np.tile(np.arange(k), (len(queries), 1))
+        results = []
+        for row, indices in zip(distances, nearest):
+            indices = indices[np.argsort(row[indices])]
+            results.append([(self.names[i], self._inches_off(row[i])) for i in indices])
+        return results
+
+    def closest_to_hair(self, hair: Hair) -> tuple[str, float]:
+        return self.closest([section._length for section in hair.sections])[0]
+
+
+@lru_cache(maxsize=None)
+def get_catalogue() -> StyleCatalogue:
+    return StyleCatalogue(catalogue_styles())
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import datetime
+import heapq
+import math
+
+from services import ServiceCommand, get_command, record_service
+from styles import BASE_STYLES
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Game
+    from character import Character
+    from hair import Hair
+
+
+# Game minutes each service takes, per section for the tools
+SERVICE_MINUTES = {
+    'cape': 1,
+    'neck roll': 1,
+    'wash': 5,
+    'scissors': 2,
+    'clippers': 1,
+    'blow dry': 8,
+    'clean': 1,
+    'free': 1,
+    'send off': 1,
+}
+
+PREP = ['cape', 'neck roll', 'wash']
+FINISH = ['blow dry', 'clean', 'free', 'send off']
+
+
+def cut_steps(hair: Hair, target: list[float]) -> list[tuple[ServiceCommand, list[int]]]:
+    """The cuts that take a head of hair down to a style's lengths, grouped into one step per tool setting.
+
+    Sections going under an inch are clippered with the nearest guard, the rest are cut with the largest scissor
+    settings that don't take off too much."""
+    steps: dict[ServiceCommand, list[int]] = {}
+    for i, (section, goal) in enumerate(zip(hair.sections, target)):
+        length = section._length
+        if length <= goal: continue
+
+        if goal < 1:
+            steps.setdefault(get_command('clippers', min(round(goal*8), 8)), []).append(i)
+        else:
+            while length - goal >= 1:
+                cut = 2**min(int(math.log2(length - goal)), 4)
+                steps.setdefault(get_command('scissors', cut), []).append(i)
+                length -= cut
+
+    return list(steps.items())
+
+
+class Stylist:
+
+    __slots__ = ('name', 'customer', 'customer_id', 'chair', 'plan', 'step', 'job')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.customer: Character|None = None
+        self.customer_id = -1  # of the customer when they were claimed, with the chair they were in
+        self.chair = -1
+        self.plan: list[tuple[ServiceCommand, list[int]|None, int]] = []  # (command, sections, ticks it takes)
+        self.step = 0
+        self.job = 0  # counts customers claimed, so that steps scheduled for a dropped customer are skipped
+
+
+class StylistPool:
+    """Stylists that serve customers in the haircutting chairs without the player, for simulating a busy salon.
+
+    An idle stylist calls the next customer over whenever a haircutting chair is free, and claims them once they've
+    sat down. Each service in their plan then takes time on the game clock. Stylists are woken from a heap ordered by
+    when their current service finishes, so a tick only does work for stylists that have something to do."""
+
+    DISPATCH_INTERVAL = 15  # ticks between looking for customers to call over and claim
+
+    def __init__(self, game: Game, count: int) -> None:
+        self.game = game
+        self.world = game.world
+
+        self.stylists = [Stylist(f'Stylist {i+1}') for i in range(count)]
+        self.idle = list(range(count))
+        self.schedule: list[tuple[int, int, int, int]] = []  # (tick the stylist's service finishes, order, stylist, job)
+        self.scheduled = 0
+
+        self.claimed: set[Character] = set()
+        self.haircuts_done = 0
+
+    def ticks_for(self, command: ServiceCommand, sections: list[int]|None) -> int:
+        minutes = SERVICE_MINUTES[command.name] * (len(sections) if sections is not None else 1)
+        return max(self.game.ticks_in(datetime.timedelta(minutes=minutes)), 1)
+
+    def plan_for(self, customer: Character) -> list[tuple[ServiceCommand, list[int]|None, int]]:
+        """Prep, cuts towards a style the customer's hair is longer than somewhere, then finishing."""
+        lengths = [section._length for section in customer.hair.sections]
+        styles = [target for target in BASE_STYLES.values() if any(goal < length for goal, length in zip(target, lengths))]
+
+        steps: list[tuple[ServiceCommand, list[int]|None]] = [(get_command(name), None) for name in PREP]
+        if styles:
+            steps += cut_steps(customer.hair, self.game.random.choice(styles))
+        steps += [(get_command(name), None) for name in FINISH]
+
+        return [(command, sections, self.ticks_for(command, sections)) for command, sections in steps]
+
+    def schedule_stylist(self, index: int, tick: int):
+        heapq.heappush(self.schedule, (tick, self.scheduled, index, self.stylists[index].job))
+        self.scheduled += 1
+
+    def still_seated(self, stylist: Stylist) -> bool:
+        """Whether the customer a stylist claimed is still the one in the chair they were claimed in."""
+        customer = stylist.customer
+        return (customer is not None and customer.customer_id == stylist.customer_id
+                and self.world.haircutting_chairs[self.world.HAIRCUTTING_CHAIRS[stylist.chair]] is customer)
+
+    def release(self, index: int):
+        stylist = self.stylists[index]
+        self.claimed.discard(stylist.customer) # type: ignore
+        stylist.customer, stylist.plan = None, []
+        stylist.job += 1
+        self.idle.append(index)
+
+    def forget(self, customer: Character):
+        """Drops a customer that's leaving or that the player has taken over, along with any stylist's plan for them."""
+        if customer not in self.claimed: return
+
+        for index, stylist in enumerate(self.stylists):
+            if stylist.customer is customer:
+                self.release(index)
+
+    def is_seated(self, customer: Character, chairs: list) -> bool:
+        return not customer.pending_actions and customer.position == chairs[customer.entities.chair[customer.id]]
+
+    def dispatch(self):
+        """Calls customers over to free haircutting chairs and gives idle stylists the customers sitting in them."""
+        game = self.game
+        players_customer = game.haircutting_chair.character if game.current_view == 'haircutting_chair' else None
+
+        # Claiming customers already in a chair comes first, so that stylists don't call more customers than they serve
+        for customer in self.world.haircutting_chairs.values():
+            if not self.idle: break
+            if customer is None or customer in self.claimed or customer is players_customer: continue
+            if not self.is_seated(customer, self.world.HAIRCUTTING_CHAIRS): continue
+
+            index = self.idle.pop()
+            stylist = self.stylists[index]
+            stylist.customer, stylist.plan, stylist.step = customer, self.plan_for(customer), 0
+            stylist.customer_id, stylist.chair = customer.customer_id, customer.entities.chair[customer.id]
+            self.claimed.add(customer)
+            self.schedule_stylist(index, game.current_tick + stylist.plan[0][2])
+
+        free_chairs = sum(occupant is None for occupant in self.world.haircutting_chairs.values())
+        called = sum(('plan', 'sit in a haircutting chair') in character.pending_actions for character in game.characters)
+        to_call = min(free_chairs, len(self.idle)) - called
+        if to_call <= 0: return
+
+        # Longest waiting first
+        waiting = [customer for customer in self.world.waiting_chairs.values()
+                   if customer is not None and customer.state == 'waiting' and self.is_seated(customer, self.world.WAITING_CHAIRS)]
+        waiting.sort(key=lambda customer: customer.entities.state_since[customer.id])
+        for customer in waiting[:to_call]:
+            customer.add_action('plan', 'sit in a haircutting chair')
+
+    def update(self):
+        tick = self.game.current_tick
+        if tick % self.DISPATCH_INTERVAL == 0:
+            self.dispatch()
+
+        while self.schedule and self.schedule[0][0] <= tick:
+            _, _, index, job = heapq.heappop(self.schedule)
+            stylist = self.stylists[index]
+            if job != stylist.job: continue
+
+            # The customer may have been sent off by the player or have left, then there's nothing to finish
+            if not self.still_seated(stylist):
+                self.release(index)
+                continue
+
+            customer = stylist.customer
+            command, sections, _ = stylist.plan[stylist.step]
+
+            if sections is None:
+                command.apply(customer) # type: ignore
+                record_service(customer, command) # type: ignore
+            else:
+                hair_sections = [customer.hair.sections[i] for i in sections] # type: ignore
+                command.apply_many(customer, hair_sections) # type: ignore
+                record_service(customer, command, hair_sections) # type: ignore
+
+            stylist.step += 1
+            if stylist.step < len(stylist.plan):
+                self.schedule_stylist(index, tick + stylist.plan[stylist.step][2])
+            else:
+                customer.hair.evaluate_description() # type: ignore
+                self.release(index)
+                self.haircuts_done += 1
+
+    def __str__(self) -> str:
+        return f'{len(self.stylists)} stylists, {len(self.stylists)-len(self.idle)} busy, {self.haircuts_done} haircuts done'
@@ -12,23 +12,25 @@ def only_alnum(string: str):
     return ''.join([i for i in string if i.isalnum()])
 
 
+# A node in get_path's search graph. It's defined once here, a class defined inside get_path was a new class on
+# every call and classes are reference cycles, so every path left garbage for the cyclic collector.
+class Node:
+    def __init__(self, position, g_score=float('inf'), f_score=float('inf'), parent=None):
+        self.position = position
+        self.g_score = g_score
+        self.f_score = f_score
+        self.parent = parent
+
+    def __lt__(self, other):
+        return self.f_score < other.f_score
+
+
 def get_path(start_pos: Vector2, target_pos: Vector2, is_traversable_func,
              move_dirs = [(0, 1), (0, -1), (2, 0), (-2, 0)]):
     # Define a helper function to calculate the heuristic distance between two points
     def heuristic_distance(pos1, pos2):
         return abs(pos1.x - pos2.x) + abs(pos1.y - pos2.y)
 
-    # Define a class to represent a node in the search graph
-    class Node:
-        def __init__(self, position, g_score=float('inf'), f_score=float('inf'), parent=None):
-            self.position = position
-            self.g_score = g_score
-            self.f_score = f_score
-            self.parent = parent
-
-        def __lt__(self, other):
-            return self.f_score < other.f_score
-
     # Initialize the open and closed sets
     open_set = PriorityQueue()
     closed_set = set()
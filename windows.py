@@ -7,7 +7,10 @@ from sys import platform
 from utils import log, only_alnum
 from vector import Vector2
 from character import Character
-from hair import HairSection
+from hair import Hair, HairSection, SECTION_MASKS
+from services import ServiceCommand, get_command, describe_regions, record_service
+from styles import get_catalogue
+from events import EventBus, Said, Moved, Arrived, Left
 
 
 from typing import TYPE_CHECKING
@@ -52,14 +55,28 @@ class WorldWindow:
     
     def __init__(self, game: Game) -> None:
         self.game = game
-        self.window = curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 
-                                    0, 0)
+        if not self.game.headless:
+            self.window = curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 
+                                        0, 0)
         
+        # Layouts other than the one drawn can be simulated, eg. by capacity.py
+        if self.game.settings['waiting_chairs'] is not None:
+            self.WAITING_CHAIRS = [Vector2(*position) for position in self.game.settings['waiting_chairs']]
+        if self.game.settings['haircutting_chairs'] is not None:
+            self.HAIRCUTTING_CHAIRS = [Vector2(*position) for position in self.game.settings['haircutting_chairs']]
+
         self.waiting_chairs: dict[Vector2, None|Character] = {pos: None for pos in self.WAITING_CHAIRS}
         self.haircutting_chairs: dict[Vector2, None|Character] = {pos: None for pos in self.HAIRCUTTING_CHAIRS}
 
         self.needs_refresh = True
 
+    def subscribe(self, events: EventBus):
+        for event_type in (Moved, Arrived, Left):
+            events.subscribe(event_type, self.on_characters_changed)
+
+    def on_characters_changed(self, events: list):
+        self.needs_refresh = True
+
     def draw(self):
         if self.needs_refresh:
             self.window.clear()
@@ -77,6 +94,20 @@ class WorldWindow:
             self.window.refresh()
             self.needs_refresh = False
 
+    def render_lines(self) -> list[str]:
+        """The contents of the window without its border, as plain text."""
+        rows = [list(line) for line in self.SALON]
+
+        for position, icon in [(self.game.player.position, MAN)] + [(character.position, WOMAN) for character in self.game.characters]:
+            x, y = position.x-1, position.y-1
+            if 0 <= y < len(rows) and 0 <= x < len(rows[y]):
+                rows[y][x] = icon
+                # Icons are two cells wide on the terminal
+                if x+1 < len(rows[y]) and len(icon.encode()) > 1:
+                    rows[y][x+1] = ''
+
+        return [''.join(row) for row in rows]
+
     def is_traversable(self, x, y):
         if y>0 and y-1 < len(self.SALON) and x>0 and x-1 < len(self.SALON[y-1]):
             return self.SALON[y-1][x-1] not in self.WALLS and self.SALON[y-1][x] not in self.WALLS
@@ -84,29 +115,52 @@ class WorldWindow:
             return True
         
 
+def _build_grid_layout() -> dict[tuple[int, int], tuple[int, int, str]]:
+    """(row, column, padded label) of every cell of the haircut view's hair grid, which is the same for every head."""
+    labels = [[Hair.REGION_NAMES_SHORTENED[region_name or ''] + '  ' for region_name in row] for row in Hair.REGIONS_BY_POSITION]
+    widths = [max(len(row[x]) for row in labels) for x in range(len(labels[0]))]
+
+    layout = {}
+    for y, row in enumerate(labels):
+        for x, label in enumerate(row):
+            layout[x, y] = (y, 3+sum(widths[:x]), f'{label:^{widths[x]}}')
+    return layout
+
+
+GRID_LAYOUT = _build_grid_layout()
+CELL_POSITIONS = {Hair.REGION_NAMES.index(region_name): (x, y) for y, row in enumerate(Hair.REGIONS_BY_POSITION)
+                  for x, region_name in enumerate(row) if region_name is not None}
+
+
 class HaircuttingChairWindow:
     
     def __init__(self, game: Game) -> None:
         self.game = game
         self.world = self.game.world
-        self.chat = self.game.chat
         self.character: Character = None # type: ignore
 
-        self.window = curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 
-                                    0, 0)
+        if not self.game.headless:
+            self.window = curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 
+                                        0, 0)
 
-        self.text_window = curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT)-2, ceil(curses.COLS*MAIN_WINDOW_WIDTH)-4, 
-                                    1, 2)
+            self.text_window = curses.newwin(ceil(curses.LINES*MAIN_WINDOW_HEIGHT)-2, ceil(curses.COLS*MAIN_WINDOW_WIDTH)-4, 
+                                        1, 2)
 
-        self.window.nodelay(True)
+            self.window.nodelay(True)
 
         self.current_menu = 'category'
         self.chosen_tool: str = None # type: ignore
         self.tool_mode: list[int] = None # type: ignore
 
         self.refresh_needed = False
+        self.header_needed = False  # only the customer's details changed, eg. after a cut
+        self.highlight_needed = False  # only the cursor moved
 
         self.menu_selection_position = Vector2(2, 2)
+        self.drawn_highlight: dict[tuple[int, int], int] = {}  # attribute each grid cell was last drawn with
+        self.menu_lines: dict[tuple, list[tuple[int, int, str]]] = {}  # menu text by (menu, tool, tool mode)
+
+        self.closest_style: tuple[tuple[float, ...], str] = ((), '')  # (hair lengths, text), only looked up when they change
 
     MENU_SELECTION = {'p': '(p)rep', 'c': '(c)ut', 'f': '(f)inish'}
 
@@ -124,15 +178,57 @@ class HaircuttingChairWindow:
     }
 
     TOOL_MODES = {
-        's(p)ray': (['precise', 'wide', 'bulk']),
+        's(p)ray': (['precise', 'wide', 'bulk'],),
         '(s)cissors': (['precise', 'wide', 'bulk'], [f'{2**i} inch' for i in range(5)]),
         '(c)lippers': (['precise', 'wide', 'bulk'], ['guardless'] + [f'N{i} guard' for i in range(1, 9)]),
-        '(r)azor': (['precise', 'wide', 'bulk'])
+        '(r)azor': (['precise', 'wide', 'bulk'],)
     }
 
     def get_tool_mode(self) -> list[str]:
         return [i[j] for i, j in zip(self.TOOL_MODES[self.chosen_tool], self.tool_mode)]
 
+    # Menu entries that are done straight away, mapped to their precompiled commands
+    MENU_COMMANDS = {
+        '(w)ash': get_command('wash'),
+        '(n)eck roll': get_command('neck roll'),
+        '(c)ape': get_command('cape'),
+        '(b)rush': get_command('brush'),
+        '(c)lean': get_command('clean'),
+        '(b)low dry': get_command('blow dry'),
+        '(f)ree': get_command('free'),
+        '(s)end off': get_command('send off'),
+    }
+
+    # Commands for every setting of a tool, in the same order as the tool's settings in TOOL_MODES
+    TOOL_COMMANDS = {
+        's(p)ray': [get_command('spray')],
+        '(s)cissors': [get_command('scissors', 2**i) for i in range(5)],
+        '(c)lippers': [get_command('clippers', guard) for guard in range(9)],
+        '(r)azor': [get_command('razor')],
+    }
+
+    def get_tool_command(self) -> ServiceCommand:
+        commands = self.TOOL_COMMANDS[self.chosen_tool]
+        return commands[self.tool_mode[1]] if len(self.tool_mode) > 1 else commands[0]
+
+    def get_masked_sections(self) -> list[HairSection]:
+        """The sections the chosen tool reaches in its current mode."""
+        return self.character.hair.get_masked_sections(self.get_tool_mode()[0], self.menu_selection_position)
+
+    def perform(self, command: ServiceCommand, sections: list[HairSection]|None = None):
+        events = self.game.events
+        if events.wants(Said):
+            message = command.describe(self.character, describe_regions(sections) if sections else '')
+            if message:
+                events.emit(Said, message)
+
+        if sections is None:
+            command.apply(self.character)
+        else:
+            command.apply_many(self.character, sections)
+
+        record_service(self.character, command, sections)
+
     def on_key_press(self, key: str):
         if self.current_menu == 'category':
             if key in self.MENU_SELECTION:
@@ -145,68 +241,10 @@ class HaircuttingChairWindow:
                 if chosen == '(x)back':
                     self.current_menu = 'category'
 
-                elif chosen == '(w)ash':
-                    self.chat.add_dialogue(f'You wash {self.character.name}\'s hair under a sink.')
-                    self.character.hair.on_wash()
-
-                elif chosen == '(n)eck roll':
-                    if self.character.has_neck_roll:
-                        self.chat.add_dialogue(f'You remove the neckroll from {self.character.name}\'s neck.')
-                        
-                    else:
-                        self.chat.add_dialogue(f'You wrap a neck roll around {self.character.name}\'s neck.')
-
-                    self.character.has_neck_roll = not self.character.has_neck_roll
-
-                elif chosen == '(c)ape':
-                    if self.character.has_cape:
-                        self.chat.add_dialogue(f'You uncape {self.character.name}.')
-                        
-                    else:
-                        self.chat.add_dialogue(f'You cover {self.character.name}\'s with a cape.')
-
-                    self.character.has_cape = not self.character.has_cape
-
-                elif chosen == '(b)rush':
-                    self.chat.add_dialogue(f'You brush out {self.character.name}\'s hair.')
-
-                elif chosen == '(c)lean':
-                    if self.character.has_cape:
-                        self.chat.add_dialogue(f'You clean up {self.character.name}\'s cape of cut hair.')
-                    else:
-                        self.chat.add_dialogue(f'You clean up {self.character.name}\'s dress of cut hair.')
-
-                elif chosen == '(b)low dry':
-                    self.chat.add_dialogue(f'You blow dry {self.character.name}\'s hair.')
-                    self.character.hair.on_blow_dry()
-
-                elif chosen == '(f)ree':
-                    if self.character.has_cape and self.character.has_neck_roll:
-                        self.chat.add_dialogue(f'You uncape {self.character.name} and also remove the neckroll from her neck.')
-                        self.character.has_neck_roll = False
-                        self.character.has_cape = False
-                    elif self.character.has_cape:
-                        self.chat.add_dialogue(f'You uncape {self.character.name}.')
-                        self.character.has_cape = False
-                    elif self.character.has_neck_roll:
-                        self.chat.add_dialogue(f'You remove the neckroll from {self.character.name}\'s neck.')
-                        self.character.has_neck_roll = False
-                    else:
-                        self.chat.add_dialogue(f'{self.character.name} is not caped nor does she have a neck roll on.')
-                    
-                elif chosen == '(s)end off':
-                    if self.character.has_cape and self.character.has_neck_roll:
-                        self.chat.add_dialogue(f'Remove the cape and neck roll from {self.character.name} before you send her off.')
-                    
-                    elif self.character.has_cape:
-                        self.chat.add_dialogue(f'Remove the cape from {self.character.name} before you send her off.')
-                    
-                    elif self.character.has_neck_roll:
-                        self.chat.add_dialogue(f'Remove the neck roll from {self.character.name} before you send her off.')
-                    
-                    else:
-                        self.chat.add_dialogue(f'{self.character.name} gets up from the chair.')
-                        self.character.add_action('plan', 'walk out')
+                elif chosen in self.MENU_COMMANDS:
+                    self.perform(self.MENU_COMMANDS[chosen])
+
+                    if self.character.is_leaving:
                         self.game.current_view = 'world'
 
                 elif chosen in self.LAST_TOOL_MODE:
@@ -257,112 +295,140 @@ class HaircuttingChairWindow:
                         x -= 1
 
                 self.menu_selection_position = Vector2(x, y)
+                self.highlight_needed = True
+                return
 
             elif key in ('\n', '\r'): 
-                x, y = self.menu_selection_position
-                hair_section: HairSection = self.character.hair.sections_by_position[y][x] # type: ignore
-                if self.chosen_tool == 's(p)ray':
-                    hair_section._wetness += 0.5
-                    self.chat.add_dialogue(f'You wet {self.character.name}\'s {hair_section.region_name}.')
-
-                elif self.chosen_tool == '(s)cissors':
-                    length_cut = int(self.get_tool_mode()[1].strip(' inch'))
-                    hair_section._length = max(hair_section._length-length_cut, 1)
-                    self.chat.add_dialogue(f'You cut {length_cut} inches of {self.character.name}\'s hair from her {hair_section.region_name}.')
-
-                elif self.chosen_tool == '(c)lippers':
-                    val = self.get_tool_mode()[1]
-                    if val == 'guardless':
-                        hair_section._length = 0
-                        self.chat.add_dialogue(f'You plough the guardless clippers over {self.character.name}\'s {hair_section.region_name}, revealing her bare scalp.')
-                    else:
-                        length_remaining = int(self.get_tool_mode()[1].strip('N').strip(' guard'))/8
-                        hair_section._length = length_remaining
-                        self.chat.add_dialogue(f'You plough through {self.character.name}\'s {hair_section.region_name}, leaving behind a {length_remaining} inch stubble.')
-
-                elif self.chosen_tool == '(r)azor':
-                    pass
+                # Wide and bulk modes cut every section they reach at once, with a single message
+                self.perform(self.get_tool_command(), self.get_masked_sections())
 
                 self.character.hair.evaluate_description()
+                self.header_needed = True
+                return
             
             self.refresh_needed = True
 
+    def get_closest_style_text(self) -> str:
+        lengths = tuple(section._length for section in self.character.hair.sections)
+        if lengths != self.closest_style[0]:
+            name, inches_off = get_catalogue().closest(list(lengths))[0]
+            self.closest_style = (lengths, f'Closest style: {name}, {inches_off:.1f} inches off')
+        return self.closest_style[1]
+
     MENU_START_Y = 10
+
+    def get_menu_lines(self) -> list[tuple[int, int, str]]:
+        """The (y, x, text) of every line of the menu, laid out once for each menu, tool and tool mode."""
+        key = (self.current_menu, self.chosen_tool, tuple(self.tool_mode) if self.chosen_tool else ())
+        if key in self.menu_lines:
+            return self.menu_lines[key]
+
+        lines = []
+        if self.current_menu == 'category':
+            lines.append((self.MENU_START_Y, 2, 'Category:'))
+            for i, cat in enumerate(self.MENU_SELECTION.values()):
+                lines.append((self.MENU_START_Y+i+1, 4, cat))
+
+        elif self.chosen_tool == None:
+            lines.append((self.MENU_START_Y, 2, f'Category: {only_alnum(self.current_menu)}'))
+            for i, sel in enumerate(self.MENU_SUBSELECTION[self.current_menu].values()):
+                lines.append((self.MENU_START_Y+i+1, 4, sel))
+
+        else:
+            lines.append((self.MENU_START_Y, 2, f'Category: {only_alnum(self.current_menu)} - {only_alnum(self.chosen_tool)}'))
+            lines.append((self.MENU_START_Y+2, 5, f'{"[r]":^12}'))
+            lines.append((self.MENU_START_Y+3, 5, f'{self.TOOL_MODES[self.chosen_tool][0][self.tool_mode[0]]:^12}'))
+            lines.append((self.MENU_START_Y+4, 5, f'{"[f]":^12}'))
+
+            if len(self.tool_mode) > 1:
+                lines.append((self.MENU_START_Y+2, 39, f'{"[t]":^12}'))
+                lines.append((self.MENU_START_Y+3, 39, f'{self.TOOL_MODES[self.chosen_tool][1][self.tool_mode[1]]:^12}'))
+                lines.append((self.MENU_START_Y+4, 39, f'{"[g]":^12}'))
+
+        self.menu_lines[key] = lines
+        return lines
+
+    def get_highlight(self) -> dict[tuple[int, int], int]:
+        """The attribute of every highlighted grid cell: the cursor and the other sections the tool reaches."""
+        highlight = {CELL_POSITIONS[i]: curses.A_BOLD for i in SECTION_MASKS[self.get_tool_mode()[0]][tuple(self.menu_selection_position)]}
+        highlight[tuple(self.menu_selection_position)] = curses.A_STANDOUT
+        return highlight
+
+    def draw_cell(self, position: tuple[int, int], attribute: int):
+        y, x, text = GRID_LAYOUT[position]
+        self.text_window.addstr(self.MENU_START_Y+6+y, x, text, attribute)
+
+    def draw_header(self):
+        text_window = self.text_window
+        for y in range(1, self.MENU_START_Y):
+            text_window.move(y, 0)
+            text_window.clrtoeol()
+
+        text_window.addstr(1, 0, f'Name: {self.character.name}   Age: {self.character.age}   Mood: {self.character.mood}')
+        
+        hair_description = 'Hair: ' + self.character.hair.description
+        for i, line in enumerate(textwrap.wrap(hair_description, width=text_window.getmaxyx()[1])):
+            self.text_window.addstr(i+3, 0, line)
+
+        if self.character.has_cape and self.character.has_neck_roll:
+            self.text_window.addstr(self.MENU_START_Y-2, 0, 'Caped with neck roll.')
+
+        elif self.character.has_cape and not self.character.has_neck_roll:
+            self.text_window.addstr(self.MENU_START_Y-2, 0, 'Caped.')
+
+        elif not self.character.has_cape and self.character.has_neck_roll:
+            self.text_window.addstr(self.MENU_START_Y-2, 0, 'Has neck roll.')
+        
+        else:
+            self.text_window.addstr(self.MENU_START_Y-2, 0, 'Uncaped.')
+
+        text_window.addstr(self.MENU_START_Y-1, 0, self.get_closest_style_text()[:text_window.getmaxyx()[1]-1])
+
+    def draw_highlight(self):
+        """Redraws only the grid cells whose highlight changed since they were last drawn."""
+        highlight = self.get_highlight()
+        for position in self.drawn_highlight.keys() | highlight.keys():
+            attribute = highlight.get(position, 0)
+            if self.drawn_highlight.get(position, 0) != attribute:
+                self.draw_cell(position, attribute)
+        self.drawn_highlight = highlight
+
     def draw(self):
         if self.refresh_needed:
             window = self.window
             text_window = self.text_window
-            character = self.character
 
             window.clear()
             window.border()
             window.addstr(0, 1, 'Haircut')
 
             text_window.clear()
-
-            text_window.addstr(1, 0, f'Name: {self.character.name}   Age: {self.character.age}   Mood: {self.character.mood}')
-            
-            hair_description = 'Hair: ' + self.character.hair.description
-            for i, line in enumerate(textwrap.wrap(hair_description, width=text_window.getmaxyx()[1])):
-                self.text_window.addstr(i+3, 0, line)
-
-            if self.character.has_cape and self.character.has_neck_roll:
-                self.text_window.addstr(self.MENU_START_Y-2, 0, 'Caped with neck roll.')
-
-            elif self.character.has_cape and not self.character.has_neck_roll:
-                self.text_window.addstr(self.MENU_START_Y-2, 0, 'Caped.')
-
-            elif not self.character.has_cape and self.character.has_neck_roll:
-                self.text_window.addstr(self.MENU_START_Y-2, 0, 'Has neck roll.')
-            
-            else:
-                self.text_window.addstr(self.MENU_START_Y-2, 0, 'Uncaped.')
+            self.draw_header()
 
             # Shows line numbers
             #for i in range(0, text_window.getmaxyx()[0]): text_window.addstr(i, 0, str(i))
 
-            if self.current_menu == 'category':
-                text_window.addstr(self.MENU_START_Y, 2, 'Category:')
-                for i, cat in enumerate(self.MENU_SELECTION.values()):
-                    text_window.addstr(self.MENU_START_Y+i+1, 4, cat)
-
-            elif self.chosen_tool == None:
-                text_window.addstr(self.MENU_START_Y, 2, f'Category: {only_alnum(self.current_menu)}')
-                for i, sel in enumerate(self.MENU_SUBSELECTION[self.current_menu].values()):
-                    text_window.addstr(self.MENU_START_Y+i+1, 4, sel)
+            for y, x, text in self.get_menu_lines():
+                text_window.addstr(y, x, text)
 
-            else:
-                text_window.addstr(self.MENU_START_Y, 2, f'Category: {only_alnum(self.current_menu)} - {only_alnum(self.chosen_tool)}')
-                text_window.addstr(self.MENU_START_Y+2, 5, f'{"[r]":^12}')
-                text_window.addstr(self.MENU_START_Y+3, 5, f'{self.TOOL_MODES[self.chosen_tool][0][self.tool_mode[0]]:^12}')
-                text_window.addstr(self.MENU_START_Y+4, 5, f'{"[f]":^12}')
-                
-                if len(self.tool_mode) > 1:
-                    text_window.addstr(self.MENU_START_Y+2, 39, f'{"[t]":^12}')
-                    text_window.addstr(self.MENU_START_Y+3, 39, f'{self.TOOL_MODES[self.chosen_tool][1][self.tool_mode[1]]:^12}')
-                    text_window.addstr(self.MENU_START_Y+4, 39, f'{"[g]":^12}')
-
-                hair_sections_display = []
-                max_hair_section_length = [0] * 4
-                for row in character.hair.sections_by_position:
-                    hair_sections_display.append([])
-                    for x, section in enumerate(row):
-                        to_display = section.region_name if section else ''
-                        to_display = self.character.hair.REGION_NAMES_SHORTENED[to_display] + '  '
-                        max_hair_section_length[x] = max(max_hair_section_length[x], len(to_display))
-                        hair_sections_display[-1].append(to_display)
-
-                for y, row in enumerate(hair_sections_display):
-                    for x, to_display in enumerate(row):
-                        if Vector2(x, y)==self.menu_selection_position:
-                            text_window.addstr(self.MENU_START_Y+6+y, 3+sum(max_hair_section_length[:x]), f'{to_display:^{max_hair_section_length[x]}}', curses.A_STANDOUT)
-                        else:
-                            text_window.addstr(self.MENU_START_Y+6+y, 3+sum(max_hair_section_length[:x]), f'{to_display:^{max_hair_section_length[x]}}', 0)
+            if self.chosen_tool is not None:
+                self.drawn_highlight = self.get_highlight()
+                for position in GRID_LAYOUT:
+                    self.draw_cell(position, self.drawn_highlight.get(position, 0))
             #text_window.addstr(6, 3, 'Tool:')
 
             window.refresh()
             text_window.refresh()
-            self.refresh_needed = False
+            self.refresh_needed = self.header_needed = self.highlight_needed = False
+
+        elif self.header_needed or self.highlight_needed:
+            if self.header_needed:
+                self.draw_header()
+            if self.highlight_needed:
+                self.draw_highlight()
+
+            self.text_window.refresh()
+            self.header_needed = self.highlight_needed = False
 
 
 class ControlsWindow:
@@ -372,18 +438,26 @@ class ControlsWindow:
         self.world = self.game.world
         self.player = self.game.player
 
-        self.window = curses.newwin(curses.LINES-ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 
-                                    ceil(curses.LINES*MAIN_WINDOW_HEIGHT), 0)
-        self.window.border()
-        self.window.addstr(0, 1, 'Controls')
+        if not self.game.headless:
+            self.window = curses.newwin(curses.LINES-ceil(curses.LINES*MAIN_WINDOW_HEIGHT), ceil(curses.COLS*MAIN_WINDOW_WIDTH), 
+                                        ceil(curses.LINES*MAIN_WINDOW_HEIGHT), 0)
+            self.window.border()
+            self.window.addstr(0, 1, 'Controls')
+
+            self.window.nodelay(True)
 
-        self.window.nodelay(True)
+    def render_lines(self) -> list[str]:
+        return [f'Speed:{self.game.game_speed:g}x', f'FPS:{self.game.current_fps:4.1f}',
+                f'Pos:{self.player.position.x}x{self.player.position.y}']
 
     def draw(self):
         fps_text = f"FPS:{self.game.current_fps:4.1f}"
         self.window.addstr(1, self.window.getmaxyx()[1]-len(fps_text)-1, fps_text)
         position_text = f'Pos:{self.player.position.x}x{self.player.position.y}'
         self.window.addstr(2, self.window.getmaxyx()[1]-len(position_text)-1, position_text)
+        speed_text = f'Speed:{self.game.game_speed:g}x'
+        self.window.addstr(1, 1, f'{speed_text:<12}')
+        self.window.addstr(2, 1, 'Profiling' if self.game.profiler.running else ' '*len('Profiling'))
 
         self.window.refresh()
 
@@ -394,71 +468,149 @@ class ControlsWindow:
         'd': Vector2(2, 0),
     }
 
-    def update(self):
+    def read_keys(self) -> list[str]:
+        """Drains every key the terminal has buffered since the last frame."""
+        keys = []
         inp = self.window.getch()
+        while inp != -1:
+            keys.append(chr(inp))
+            inp = self.window.getch()
 
-        if inp != -1:
-            key = chr(inp)
+        return keys
 
-            if key == 'q':
-                self.game.running = False
+    PROFILE_KEY = 'P'
 
-            if self.game.current_view == 'world':
+    def update(self):
+        keys = self.read_keys()
 
-                if key in self.MOVE_KEYS:
-                    new_pos = self.player.position + self.MOVE_KEYS[key]
-                    if self.world.is_traversable(*new_pos):
-                        if new_pos in self.world.waiting_chairs and self.world.waiting_chairs[new_pos] is not None:
-                            self.world.waiting_chairs[new_pos].on_player_interact() # type: ignore
-                            self.game.world.needs_refresh = True
+        if self.PROFILE_KEY in keys:
+            # Profiling doesn't change the simulation, so it's handled here and kept out of journals
+            for _ in range(keys.count(self.PROFILE_KEY)):
+                self.game.events.emit(Said, self.game.profiler.toggle())
+            keys = [key for key in keys if key != self.PROFILE_KEY]
 
-                        elif new_pos in self.world.haircutting_chairs and self.world.haircutting_chairs[new_pos] is not None:
-                            self.game.on_haircut_chair_interact(self.world.haircutting_chairs[new_pos]) # type: ignore
+        if keys:
+            if self.game.recorder is not None:
+                self.game.recorder.record_keys(self.game.current_tick, keys)
 
-                        else:
-                            self.player.position += self.MOVE_KEYS[key]
-                            self.game.world.needs_refresh = True
+            self.handle_keys(keys)
+            self.window.addstr(3, self.window.getmaxyx()[1]-2, keys[-1])
 
-                elif key == 'N':
-                    created_character = Character.new(self.game)
-                    self.game.add_character(created_character)
+    def handle_keys(self, keys: list[str]):
+        i = 0
+        while i < len(keys) and self.game.running:
+            key = keys[i]
 
-                    self.game.world.needs_refresh = True
+            # Consecutive presses of the same movement key (eg. a held key) are walked as one move
+            repeats = 1
+            if self.game.current_view == 'world' and key in self.MOVE_KEYS:
+                while i+repeats < len(keys) and keys[i+repeats] == key:
+                    repeats += 1
 
-                elif key == 'n':
-                    for character in self.game.characters:
-                        if character.position in self.world.waiting_chairs:
-                            character.add_action('plan', 'sit in a haircutting chair')
-                            self.game.world.needs_refresh = True
-                            break
+                self.move_player(key, repeats)
 
-            elif self.game.current_view == 'haircutting_chair':
-                if key == 'e':
-                    self.game.current_view = 'world'
-                    self.game.world.needs_refresh = True
+            else:
+                self.handle_key(key)
 
-                else:
-                    self.game.haircutting_chair.on_key_press(key)
+            i += repeats
+
+    def move_player(self, key: str, repeats: int):
+        step = self.MOVE_KEYS[key]
+        position = self.player.position
 
-            self.window.addstr(3, self.window.getmaxyx()[1]-2, key)
+        for i in range(repeats):
+            new_pos = position + step
+            if not self.world.is_traversable(*new_pos):
+                break
+
+            if new_pos in self.world.waiting_chairs and self.world.waiting_chairs[new_pos] is not None:
+                # Bumping into the same customer again only repeats the greeting, so it's done once
+                self.world.waiting_chairs[new_pos].on_player_interact() # type: ignore
+                self.game.world.needs_refresh = True
+                break
+
+            elif new_pos in self.world.haircutting_chairs and self.world.haircutting_chairs[new_pos] is not None:
+                stylists = self.game.stylists
+                if stylists is not None and self.world.haircutting_chairs[new_pos] in stylists.claimed:
+                    # A stylist is already cutting this customer's hair
+                    break
+
+                self.game.on_haircut_chair_interact(self.world.haircutting_chairs[new_pos]) # type: ignore
+
+                # The rest of the presses now belong to the haircutting view
+                for _ in range(repeats-i-1):
+                    self.handle_key(key)
+                break
+
+            position = new_pos
+
+        if position != self.player.position:
+            self.player.position = position
+            self.game.nearby.move(self.player, position.x, position.y)
+            self.game.world.needs_refresh = True
+
+    def handle_key(self, key: str):
+        if key == 'q':
+            self.game.running = False
+
+        elif key in ('+', '-'):
+            self.game.change_game_speed(1 if key == '+' else -1)
+
+        if self.game.current_view == 'world':
+
+            if key in self.MOVE_KEYS:
+                self.move_player(key, 1)
+
+            elif key == 'N':
+                created_character = Character.new(self.game)
+                self.game.add_character(created_character)
+
+                self.game.world.needs_refresh = True
+
+            elif key == 'n':
+                for character in self.game.characters:
+                    if character.position in self.world.waiting_chairs:
+                        character.add_action('plan', 'sit in a haircutting chair')
+                        self.game.world.needs_refresh = True
+                        break
+
+        elif self.game.current_view == 'haircutting_chair':
+            if key == 'e':
+                self.game.current_view = 'world'
+                self.game.world.needs_refresh = True
+
+            else:
+                self.game.haircutting_chair.on_key_press(key)
 
 
 class ChatWindow:
     
     def __init__(self, game: Game) -> None:
         self.game = game
-        self.window = curses.newwin(curses.LINES, floor(curses.COLS*CHAT_WINDOW_WIDTH), 
-                                    0, ceil(curses.COLS*MAIN_WINDOW_WIDTH))
+        if not self.game.headless:
+            self.window = curses.newwin(curses.LINES, floor(curses.COLS*CHAT_WINDOW_WIDTH), 
+                                        0, ceil(curses.COLS*MAIN_WINDOW_WIDTH))
+            height, width = self.window.getmaxyx()
+
+        else:
+            # Wrap dialogue as it would be on a default sized terminal
+            height, width = self.game.TERMINAL_SIZE[0], floor(self.game.TERMINAL_SIZE[1]*CHAT_WINDOW_WIDTH)
 
         self.history = []
         # self.add_dialogue('ERROR! Not showing up!')
         # self.add_dialogue('ERROR! Not showing up!')
 
-        self.chat_width = self.window.getmaxyx()[1] - 2
-        self.chat_height = self.window.getmaxyx()[0] - 2
+        self.chat_width = width - 2
+        self.chat_height = height - 2
 
         self.refresh_needed = True
 
+    def subscribe(self, events: EventBus):
+        events.subscribe(Said, self.on_said)
+
+    def on_said(self, events: list[Said]):
+        for event in events:
+            self.add_dialogue(event.text())
 
     def draw(self):
         if self.refresh_needed:
@@ -473,6 +625,11 @@ class ChatWindow:
             self.window.refresh()
             self.refresh_needed = False
 
+    def render_lines(self) -> list[str]:
+        """The visible chat lines from the top of the window down, without its border."""
+        visible = self.history[-(self.chat_height-2):] if self.chat_height > 2 else []
+        return [''] * (self.chat_height-2-len(visible)) + visible
+
     def add_dialogue(self, dialogue):
         for i in range(0, len(dialogue), self.chat_width):
             self.history.append(dialogue[i:i+self.chat_width])